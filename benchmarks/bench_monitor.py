@@ -0,0 +1,224 @@
+"""
+Нагрузочный бенчмарк движка мониторинга на локальной ферме заглушек банков.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_monitor --targets 10,1000,10000 --duration 60
+
+Ферма заглушек работает в отдельном процессе, а каждый прогон движка - в своем процессе, поэтому
+процессорное время и пиковая память относятся только к движку мониторинга.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import queue
+import resource
+import tempfile
+import time
+
+from benchmarks.fake_bank_farm import FarmProfile, bank_link, run_farm
+from metrics import LatencyHistogram
+from notifier import TelegramNotifier
+from probe_engine import CHANNELS, ProbeEngine
+
+# Колонки итоговой таблицы: ключ результата, заголовок и формат значения.
+COLUMNS = (
+    ('targets', 'ссылок', '{:d}'),
+    ('probes', 'проверок', '{:d}'),
+    ('probes_per_second', 'пров/с', '{:.1f}'),
+    ('cpu_percent', 'CPU %', '{:.1f}'),
+    ('probes_per_cpu_second', 'пров/с CPU', '{:.0f}'),
+    ('max_rss_mb', 'RSS МБ', '{:.1f}'),
+    ('lag_mean_ms', 'дрейф ср мс', '{:.2f}'),
+    ('lag_max_ms', 'дрейф макс мс', '{:.1f}'),
+    ('alerts', 'уведомлений', '{:d}'),
+    ('alert_p50_s', 'увед p50 с', '{:.2f}'),
+    ('alert_p95_s', 'увед p95 с', '{:.2f}'),
+)
+
+
+def make_organizations(targets: int, ports: list) -> list:
+    """
+    Функция, создающая список организаций заглушек. У каждой организации две ссылки, website и mobile,
+    ссылки равномерно распределены по портам фермы.
+
+    Args:
+        targets (int): Количество проверяемых ссылок
+        ports (list): Порты заглушек банков
+
+    Returns:
+        list: Список словарей организаций
+    """
+    organizations = []
+    for number in range((targets + len(CHANNELS) - 1) // len(CHANNELS)):
+        organisation = {'organisation_name': f'Банк {number}', 'service_name': 'Интернет-банк'}
+        for offset, (channel, link_key) in enumerate(CHANNELS.items()):
+            index = number * len(CHANNELS) + offset
+            organisation[link_key] = bank_link(ports[index % len(ports)], index, channel)
+        organizations.append(organisation)
+    return organizations
+
+
+async def drive_engine(targets: int, args, ports: list, telegram_port: int) -> dict:
+    """
+    Функция, которая запускает движок мониторинга на targets ссылках фермы заглушек на args.duration секунд
+    с уведомлениями в заглушку Telegram и измеряет пропускную способность, CPU, память и опоздание планировщика.
+
+    Args:
+        targets (int): Количество проверяемых ссылок
+        args: Аргументы командной строки
+        ports (list): Порты заглушек банков
+        telegram_port (int): Порт заглушки Telegram Api
+
+    Returns:
+        dict: Результат прогона без задержки уведомлений, ее добавляет run_scale
+    """
+    notifier = TelegramNotifier('bench', '0', f'http://127.0.0.1:{telegram_port}', args.batch_window,
+                                args.notifications_per_minute / 60)
+    notifier.start()
+    with tempfile.TemporaryDirectory() as events_dir:
+        engine = ProbeEngine(make_organizations(targets, ports), 1, notifier.notify, concurrency=args.concurrency,
+                             timeout=args.timeout, healthy_interval=args.healthy_interval,
+                             failing_interval=args.failing_interval, duration=args.duration, events_dir=events_dir,
+                             probe_method=args.probe_method, limit_per_host=args.limit_per_host)
+        wall_started, cpu_started = time.monotonic(), time.process_time()
+        try:
+            await engine.run()
+        finally:
+            await notifier.close()
+        wall, cpu = time.monotonic() - wall_started, time.process_time() - cpu_started
+    return {
+        'targets': len(engine.targets),
+        'probes': engine.probe_count,
+        'probes_per_second': engine.probe_count / wall,
+        'cpu_percent': cpu / wall * 100,
+        'probes_per_cpu_second': engine.probe_count / cpu if cpu else 0.0,
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'lag_mean_ms': engine.scheduler.mean_lag() * 1000,
+        'lag_max_ms': engine.scheduler.max_lag * 1000,
+        'notifications_dropped': notifier.dropped,
+    }
+
+
+def run_scale(targets: int, args, ports: list, telegram_port: int, alerts, results) -> None:
+    """
+    Точка входа процесса одного прогона движка. Считает задержку уведомлений: от начала падения
+    периодически падающей ссылки до получения уведомления заглушкой Telegram. Падения, начавшиеся
+    до запуска движка, не учитываются.
+
+    Args:
+        targets (int): Количество проверяемых ссылок
+        args: Аргументы командной строки
+        ports (list): Порты заглушек банков
+        telegram_port (int): Порт заглушки Telegram Api
+        alerts: Очередь уведомлений от заглушки Telegram
+        results: Очередь, в которую кладется результат прогона
+
+    Returns:
+        None
+    """
+    logging.basicConfig(level=args.log_level, format='%(asctime)s %(levelname)s %(message)s')
+    started = time.time()
+    result = asyncio.run(drive_engine(targets, args, ports, telegram_port))
+    latency = LatencyHistogram(lowest=0.01, highest=1024.0)
+    while True:
+        try:
+            index, received, down_at = alerts.get(timeout=1.0)
+        except queue.Empty:
+            break
+        if down_at >= started:
+            latency.record(received - down_at)
+    p50, p95 = latency.percentiles([50, 95])
+    results.put({**result, 'alerts': latency.count, 'alert_p50_s': p50, 'alert_p95_s': p95,
+                 'alert_max_s': latency.max})
+
+
+def format_table(rows: list) -> str:
+    """
+    Функция, форматирующая результаты прогонов в текстовую таблицу.
+
+    Args:
+        rows (list): Результаты прогонов
+
+    Returns:
+        str: Таблица
+    """
+    cells = [[title for _, title, _ in COLUMNS]]
+    cells += [[value_format.format(row[key]) for key, _, value_format in COLUMNS] for row in rows]
+    widths = [max(len(row[column]) for row in cells) for column in range(len(COLUMNS))]
+    return '\n'.join('  '.join(cell.rjust(width) for cell, width in zip(row, widths)) for row in cells)
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Функция, разбирающая аргументы командной строки бенчмарка: размеры прогонов, настройки движка
+    и профиль фермы заглушек.
+
+    Returns:
+        argparse.Namespace: Параметры бенчмарка
+    """
+    parser = argparse.ArgumentParser(description='Нагрузочный бенчмарк движка мониторинга')
+    parser.add_argument('--targets', default='10,1000,10000', help='Количество ссылок в прогонах через запятую')
+    parser.add_argument('--duration', type=int, default=60, help='Длительность одного прогона в секундах')
+    parser.add_argument('--healthy-interval', type=int, default=10)
+    parser.add_argument('--failing-interval', type=int, default=5)
+    parser.add_argument('--timeout', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=500)
+    parser.add_argument('--limit-per-host', type=int, default=32)
+    parser.add_argument('--probe-method', default='range')
+    parser.add_argument('--batch-window', type=float, default=2.0)
+    parser.add_argument('--notifications-per-minute', type=float, default=20)
+    parser.add_argument('--ports', type=int, default=16, help='Количество портов фермы заглушек')
+    parser.add_argument('--base-port', type=int, default=18100)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--latency-jitter', type=float, default=0.01)
+    parser.add_argument('--error-rate', type=float, default=0.01)
+    parser.add_argument('--timeout-rate', type=float, default=0.005)
+    parser.add_argument('--flapping-rate', type=float, default=0.01)
+    parser.add_argument('--flap-period', type=float, default=30.0)
+    parser.add_argument('--flap-downtime', type=float, default=10.0)
+    parser.add_argument('--log-level', default='WARNING', help='Уровень логов движка, INFO выводит каждую проверку')
+    parser.add_argument('--output', help='Файл, в который сохраняются результаты в JSON для сравнения прогонов')
+    return parser.parse_args()
+
+
+def main() -> None:
+    """
+    Основная функция бенчмарка: запускает ферму заглушек в отдельном процессе, затем по очереди выполняет
+    прогоны движка, каждый в своем процессе, выводит таблицу результатов и при необходимости сохраняет ее в JSON.
+
+    Returns:
+        None
+    """
+    args = parse_args()
+    profile = FarmProfile(args.latency, args.latency_jitter, args.error_rate, args.timeout_rate, args.timeout + 3.0,
+                          args.flapping_rate, args.flap_period, args.flap_downtime)
+    ports = [args.base_port + offset for offset in range(args.ports)]
+    telegram_port = args.base_port + args.ports
+    alerts, results, ready = multiprocessing.Queue(), multiprocessing.Queue(), multiprocessing.Event()
+    farm = multiprocessing.Process(target=run_farm, args=(ports, telegram_port, profile, time.time(), alerts, ready),
+                                   daemon=True)
+    farm.start()
+    if not ready.wait(10):
+        raise RuntimeError('Ферма заглушек не запустилась')
+    rows = []
+    try:
+        for targets in (int(value) for value in args.targets.split(',')):
+            process = multiprocessing.Process(target=run_scale, args=(targets, args, ports, telegram_port, alerts,
+                                                                      results))
+            process.start()
+            rows.append(results.get())
+            process.join()
+            print(format_table(rows[-1:]), flush=True)
+    finally:
+        farm.terminate()
+    print()
+    print(format_table(rows))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump({'settings': vars(args), 'results': rows}, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+import asyncio
+import random
+import time
+import zlib
+
+from aiohttp import web
+
+# Ответ заглушки банка. Тело короткое, поэтому ответ одинаково дешев для GET, HEAD и GET с Range.
+RESPONSE = (b'HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\nContent-Length: 2\r\n'
+            b'Connection: keep-alive\r\n\r\nok')
+HEAD_RESPONSE = RESPONSE[:-2]
+
+
+class FarmProfile:
+    """
+    Поведение заглушек банков. Каждая заглушка отвечает с задержкой latency ± latency_jitter секунд,
+    с вероятностью error_rate обрывает соединение без ответа, а с вероятностью timeout_rate отвечает через
+    timeout_delay секунд, то есть позже таймаута монитора. Доля flapping_rate ссылок периодически падает:
+    каждые flap_period секунд ссылка на flap_downtime секунд обрывает все соединения. Случайные ошибки
+    и таймауты бывают только у ссылок, которые не падают периодически, чтобы по ним считалась задержка уведомлений.
+
+    Args:
+        latency (float): Средняя задержка ответа в секундах
+        latency_jitter (float): Разброс задержки ответа в секундах
+        error_rate (float): Доля запросов, на которые соединение обрывается
+        timeout_rate (float): Доля запросов, на которые ответ приходит через timeout_delay секунд
+        timeout_delay (float): Задержка ответа при таймауте в секундах
+        flapping_rate (float): Доля ссылок, которые периодически падают
+        flap_period (float): Период падений в секундах
+        flap_downtime (float): Длительность одного падения в секундах
+    """
+
+    def __init__(self, latency: float = 0.02, latency_jitter: float = 0.01, error_rate: float = 0.01,
+                 timeout_rate: float = 0.005, timeout_delay: float = 5.0, flapping_rate: float = 0.01,
+                 flap_period: float = 30.0, flap_downtime: float = 10.0):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_delay = timeout_delay
+        self.flapping_rate = flapping_rate
+        self.flap_period = flap_period
+        self.flap_downtime = flap_downtime
+
+
+def _fraction(index: int, salt: str) -> float:
+    return zlib.crc32(f'{salt}:{index}'.encode()) / 2 ** 32
+
+
+def is_flapping(index: int, profile: FarmProfile) -> bool:
+    """
+    Функция, определяющая, падает ли ссылка периодически. Выбор детерминирован, поэтому одинаков
+    в процессе фермы и в процессе бенчмарка.
+
+    Args:
+        index (int): Номер ссылки
+        profile (FarmProfile): Поведение заглушек
+
+    Returns:
+        bool: True, если ссылка периодически падает
+    """
+    return _fraction(index, 'flap') < profile.flapping_rate
+
+
+def last_down_at(index: int, now: float, epoch: float, profile: FarmProfile) -> float:
+    """
+    Функция, возвращающая время последнего начала падения периодически падающей ссылки не позже now.
+
+    Args:
+        index (int): Номер ссылки
+        now (float): Время, секунды с начала эпохи
+        epoch (float): Время запуска фермы, секунды с начала эпохи
+        profile (FarmProfile): Поведение заглушек
+
+    Returns:
+        float: Время начала падения, секунды с начала эпохи
+    """
+    return now - (now - epoch + _fraction(index, 'phase') * profile.flap_period) % profile.flap_period
+
+
+def is_down(index: int, now: float, epoch: float, profile: FarmProfile) -> bool:
+    """
+    Функция, определяющая, лежит ли ссылка в момент now.
+
+    Args:
+        index (int): Номер ссылки
+        now (float): Время, секунды с начала эпохи
+        epoch (float): Время запуска фермы, секунды с начала эпохи
+        profile (FarmProfile): Поведение заглушек
+
+    Returns:
+        bool: True, если ссылка в этот момент периодически падает
+    """
+    return is_flapping(index, profile) and now - last_down_at(index, now, epoch, profile) < profile.flap_downtime
+
+
+def bank_link(port: int, index: int, channel: str) -> str:
+    """
+    Функция, возвращающая ссылку заглушки банка.
+
+    Args:
+        port (int): Порт заглушки
+        index (int): Номер ссылки
+        channel (str): Канал проверки, website или mobile
+
+    Returns:
+        str: Ссылка
+    """
+    return f'http://127.0.0.1:{port}/bank/{index}/{channel}'
+
+
+def link_index(link: str) -> int:
+    """
+    Функция, возвращающая номер ссылки заглушки по ссылке или пути запроса.
+
+    Args:
+        link (str): Ссылка или путь запроса вида /bank/<номер>/<канал>
+
+    Returns:
+        int: Номер ссылки или -1, если ссылка не принадлежит ферме
+    """
+    parts = link.split('/bank/', 1)
+    if len(parts) < 2 or not parts[1].split('/', 1)[0].isdigit():
+        return -1
+    return int(parts[1].split('/', 1)[0])
+
+
+class BankProtocol(asyncio.Protocol):
+    """
+    Минимальный HTTP/1.1 сервер заглушки банка с keep-alive. Написан на asyncio.Protocol, а не на aiohttp.web,
+    чтобы сама ферма тратила как можно меньше процессора и не искажала замеры монитора.
+
+    Args:
+        profile (FarmProfile): Поведение заглушек
+        epoch (float): Время запуска фермы, секунды с начала эпохи
+    """
+
+    def __init__(self, profile: FarmProfile, epoch: float):
+        self.profile = profile
+        self.epoch = epoch
+        self.transport = None
+        self.buffer = b''
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+
+    def data_received(self, data: bytes) -> None:
+        self.buffer += data
+        while b'\r\n\r\n' in self.buffer:
+            head, self.buffer = self.buffer.split(b'\r\n\r\n', 1)
+            method, path = head.split(b' ', 2)[:2]
+            self.handle(method, path.decode('latin-1'))
+
+    def handle(self, method: bytes, path: str) -> None:
+        profile, index = self.profile, link_index(path)
+        if is_down(index, time.time(), self.epoch, profile):
+            self.transport.abort()
+            return
+        response = HEAD_RESPONSE if method == b'HEAD' else RESPONSE
+        delay = max(0.0, random.uniform(profile.latency - profile.latency_jitter,
+                                        profile.latency + profile.latency_jitter))
+        if not is_flapping(index, profile):
+            chance = random.random()
+            if chance < profile.error_rate:
+                self.transport.abort()
+                return
+            if chance < profile.error_rate + profile.timeout_rate:
+                delay = profile.timeout_delay
+        asyncio.get_running_loop().call_later(delay, self.respond, response)
+
+    def respond(self, response: bytes) -> None:
+        if not self.transport.is_closing():
+            self.transport.write(response)
+
+
+async def serve_farm(ports: list, telegram_port: int, profile: FarmProfile, epoch: float, alerts, ready) -> None:
+    """
+    Функция, запускающая заглушки банков на портах ports и заглушку Telegram Api на порту telegram_port.
+    Заглушка Telegram для каждой строки уведомления о падении периодически падающей ссылки кладет в очередь
+    alerts кортеж (номер ссылки, время получения уведомления, время начала падения).
+
+    Args:
+        ports (list): Порты заглушек банков
+        telegram_port (int): Порт заглушки Telegram Api
+        profile (FarmProfile): Поведение заглушек
+        epoch (float): Время запуска фермы, секунды с начала эпохи
+        alerts: Очередь multiprocessing для уведомлений
+        ready: Событие multiprocessing, которое выставляется, когда все заглушки запущены
+
+    Returns:
+        None
+    """
+    loop = asyncio.get_running_loop()
+    for port in ports:
+        await loop.create_server(lambda: BankProtocol(profile, epoch), '127.0.0.1', port, backlog=4096)
+
+    async def handle_send_message(request):
+        received = time.time()
+        data = await request.post()
+        for line in data.get('text', '').split('\n'):
+            fields = line.split(' - ')
+            if len(fields) < 5 or fields[-1] == 'Восстановление':
+                continue
+            index = link_index(fields[2])
+            if index >= 0 and is_flapping(index, profile):
+                alerts.put((index, received, last_down_at(index, received, epoch, profile)))
+        return web.json_response({'ok': True})
+
+    app = web.Application()
+    app.router.add_post('/bot{token}/sendMessage', handle_send_message)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', telegram_port).start()
+    ready.set()
+    await asyncio.Event().wait()
+
+
+def run_farm(ports: list, telegram_port: int, profile: FarmProfile, epoch: float, alerts, ready) -> None:
+    """
+    Точка входа процесса фермы, см. serve_farm.
+
+    Returns:
+        None
+    """
+    asyncio.run(serve_farm(ports, telegram_port, profile, epoch, alerts, ready))
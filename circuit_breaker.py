@@ -0,0 +1,112 @@
+import logging
+
+# Состояния выключателя: проверки идут, проверки приостановлены, разрешена одна пробная проверка.
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class CircuitBreaker:
+    """
+    Автоматический выключатель проверок одного хоста. Пока хост отвечает, выключатель замкнут и проверки всех
+    ссылок хоста идут по своему расписанию. Когда проверки ссылок хоста threshold раз подряд заканчиваются ошибкой,
+    выключатель размыкается: на cooldown секунд проверки ссылок хоста не выполняются, а во время регионального
+    сбоя мониторинг не нагружает сеть запросами, каждый из которых ждет таймаут. После паузы разрешается одна
+    пробная проверка. Если она успешна, то выключатель замыкается, иначе размыкается снова на паузу,
+    увеличенную в backoff раз, но не больше max_cooldown секунд. Последний неудачный результат проверки хоста
+    хранится в last_failure, чтобы его можно было учесть для ссылок, проверки которых не выполнялись.
+
+    Args:
+        host (str): Хост ссылок
+        threshold (int): Сколько ошибок подряд размыкают выключатель, 0 - никогда не размыкать
+        cooldown (float): Пауза до первой пробной проверки в секундах
+        max_cooldown (float): Максимальная пауза до пробной проверки в секундах
+        backoff (float): Во сколько раз увеличивается пауза после каждой неудачной пробной проверки
+    """
+
+    def __init__(self, host: str, threshold: int = 5, cooldown: float = 20.0, max_cooldown: float = 120.0,
+                 backoff: float = 1.5):
+        self.host = host
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.backoff = backoff
+        self.state = CLOSED
+        self.failures = 0
+        self.retry_at = 0.0
+        self.last_failure = None
+        self._openings = 0
+        self._trial = False
+
+    def allow(self, now: float) -> bool:
+        """
+        Функция, решающая, можно ли сейчас проверить ссылку хоста. В полуоткрытом состоянии разрешается
+        только одна пробная проверка за раз.
+
+        Args:
+            now (float): Текущее время по монотонным часам
+
+        Returns:
+            bool: True, если проверку можно выполнить
+        """
+        if self.state == OPEN and now >= self.retry_at:
+            self.state = HALF_OPEN
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self._trial:
+            self._trial = True
+            return True
+        return False
+
+    def retry_in(self, now: float, wait: float) -> float:
+        """
+        Функция, возвращающая паузу до следующей попытки проверить ссылку, которую выключатель не пропустил.
+
+        Args:
+            now (float): Текущее время по монотонным часам
+            wait (float): Пауза, если идет пробная проверка, в секундах
+
+        Returns:
+            float: Пауза в секундах
+        """
+        if self.state == OPEN:
+            return max(0.0, self.retry_at - now)
+        return wait
+
+    def release_trial(self) -> None:
+        """
+        Функция, снимающая отметку пробной проверки, которая не закончилась результатом, например из-за
+        непредвиденной ошибки. Следующая попытка проверить ссылку хоста снова станет пробной.
+
+        Returns:
+            None
+        """
+        self._trial = False
+
+    def record(self, success: bool, now: float, trial: bool = False, result=None) -> None:
+        """
+        Функция, учитывающая результат проверки ссылки хоста.
+
+        Args:
+            success (bool): Успешна ли проверка
+            now (float): Время окончания проверки по монотонным часам
+            trial (bool): Была ли проверка пробной
+            result: Результат проверки, неудачный результат сохраняется в last_failure
+
+        Returns:
+            None
+        """
+        if trial:
+            self._trial = False
+        if success:
+            if self.state != CLOSED:
+                logging.info(f"Хост {self.host} снова отвечает, проверки возобновлены")
+            self.state, self.failures, self._openings = CLOSED, 0, 0
+            return
+        self.failures += 1
+        self.last_failure = result
+        if (self.state == HALF_OPEN and trial) or (self.state == CLOSED and self.threshold
+                                                   and self.failures >= self.threshold):
+            cooldown = min(self.cooldown * self.backoff ** self._openings, max(self.cooldown, self.max_cooldown))
+            self._openings += 1
+            self.state, self.retry_at = OPEN, now + cooldown
+            logging.warning(f"Хост {self.host} не отвечает {self.failures} проверок подряд, "
+                            f"проверки приостановлены на {cooldown:.0f} с")
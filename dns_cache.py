@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import socket
+
+from aiohttp.abc import AbstractResolver
+
+try:
+    import aiodns
+except ImportError:
+    aiodns = None
+
+# Записи DNS для семейства адресов.
+QUERY_TYPES = {socket.AF_INET: ('A',), socket.AF_INET6: ('AAAA',), socket.AF_UNSPEC: ('A', 'AAAA')}
+
+
+class DNSResolutionError(OSError):
+    """
+    Ошибка разрешения имени хоста. aiohttp оборачивает ее в ClientConnectorError, а исходная ошибка
+    доступна через os_error, поэтому сбои DNS можно отличить от ошибок подключения.
+    """
+
+
+class _CacheEntry:
+    def __init__(self, addresses: list, expires_at: float, refresh_at: float, error: str = None):
+        self.addresses = addresses
+        self.expires_at = expires_at
+        self.refresh_at = refresh_at
+        self.error = error
+
+
+class CachingResolver(AbstractResolver):
+    """
+    Общий для всех проверок асинхронный кеш DNS. Адреса хоста хранятся столько, сколько указано в TTL
+    ответа DNS, но не меньше min_ttl и не больше max_ttl. TTL известен, только если установлен aiodns,
+    иначе, а также для имен, которые DNS не разрешил (например из /etc/hosts), используется getaddrinfo,
+    а адреса хранятся default_ttl секунд. Ошибка разрешения
+    кешируется на negative_ttl секунд, поэтому недоступный DNS не опрашивается каждой проверкой.
+    Одновременные запросы одного хоста выполняют одно разрешение. Когда прошло 80% TTL, адреса
+    обновляются в фоне, а если обновить адреса не удалось, то еще stale_ttl секунд используются прежние,
+    чтобы медленный или недоступный DNS не приводил к ложным сбоям.
+
+    Args:
+        default_ttl (float): Сколько секунд хранить адреса, если TTL неизвестен
+        negative_ttl (float): Сколько секунд хранить ошибку разрешения
+        min_ttl (float): Минимальное время хранения адресов в секундах
+        max_ttl (float): Максимальное время хранения адресов в секундах
+        stale_ttl (float): Сколько секунд после истечения TTL использовать прежние адреса, если DNS не отвечает
+        timeout (float): Таймаут запросов DNS и getaddrinfo в секундах
+    """
+
+    def __init__(self, default_ttl: float = 60, negative_ttl: float = 5, min_ttl: float = 5, max_ttl: float = 3600,
+                 stale_ttl: float = 300, timeout: float = 2):
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.stale_ttl = stale_ttl
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+        self._cache = {}
+        self._pending = {}
+        self._aiodns = None
+
+    async def resolve(self, host: str, port: int = 0, family: int = socket.AF_INET) -> list:
+        """
+        Функция, возвращающая адреса хоста в формате aiohttp.
+
+        Args:
+            host (str): Имя хоста
+            port (int): Порт
+            family (int): Семейство адресов
+
+        Returns:
+            list: Список словарей адресов
+
+        Raises:
+            DNSResolutionError: Если имя не удалось разрешить
+        """
+        loop = asyncio.get_running_loop()
+        key = (host, family)
+        entry = self._cache.get(key)
+        now = loop.time()
+        if entry is not None and now < entry.expires_at:
+            self.hits += 1
+            if entry.error is None and now >= entry.refresh_at:
+                self._refresh(key)
+        else:
+            self.misses += 1
+            # shield: отмена одной проверки по таймауту не должна отменять разрешение, которого ждут другие.
+            entry = await asyncio.shield(self._refresh(key))
+        if entry.error is not None:
+            raise DNSResolutionError(socket.EAI_NONAME, entry.error)
+        return [{'hostname': host, 'host': address, 'port': port, 'family': address_family, 'proto': 0,
+                 'flags': socket.AI_NUMERICHOST | socket.AI_NUMERICSERV}
+                for address_family, address in entry.addresses]
+
+    async def prefetch(self, hosts: list, family: int = socket.AF_UNSPEC) -> int:
+        """
+        Функция, заранее разрешающая имена хостов, например при запуске мониторинга, чтобы первые
+        проверки не тратили время на DNS.
+
+        Args:
+            hosts (list): Имена хостов
+            family (int): Семейство адресов, с которым aiohttp будет запрашивать адреса
+
+        Returns:
+            int: Количество хостов, которые удалось разрешить
+        """
+        entries = await asyncio.gather(*(self._refresh((host, family)) for host in set(hosts)))
+        return sum(entry.error is None for entry in entries)
+
+    async def close(self) -> None:
+        """
+        Функция, освобождающая ресурсы резолвера.
+
+        Returns:
+            None
+        """
+        for task in self._pending.values():
+            task.cancel()
+        self._pending.clear()
+        if self._aiodns is not None and hasattr(self._aiodns, 'close'):
+            await self._aiodns.close()
+
+    def _refresh(self, key: tuple) -> asyncio.Future:
+        task = self._pending.get(key)
+        if task is None:
+            task = self._pending[key] = asyncio.ensure_future(self._lookup(key))
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        return task
+
+    async def _lookup(self, key: tuple) -> _CacheEntry:
+        host, family = key
+        loop = asyncio.get_running_loop()
+        try:
+            addresses, ttl = await self._query(host, family)
+            if not addresses:
+                raise DNSResolutionError(socket.EAI_NONAME, 'нет адресов')
+        except (OSError, asyncio.TimeoutError) as e:
+            self.failures += 1
+            reason = 'таймаут DNS' if isinstance(e, asyncio.TimeoutError) else e.strerror or str(e)
+            previous = self._cache.get(key)
+            now = loop.time()
+            if previous is not None and previous.error is None and now < previous.expires_at + self.stale_ttl:
+                logging.warning(f"Не удалось обновить адреса {host}: {reason}, используются прежние")
+                previous.refresh_at = now + self.negative_ttl
+                previous.expires_at = max(previous.expires_at, now + self.negative_ttl)
+                return previous
+            entry = _CacheEntry([], now + self.negative_ttl, now + self.negative_ttl, f'{host}: {reason}')
+        else:
+            ttl = min(max(ttl, self.min_ttl), self.max_ttl)
+            now = loop.time()
+            entry = _CacheEntry(addresses, now + ttl, now + ttl * 0.8)
+        self._cache[key] = entry
+        return entry
+
+    async def _query(self, host: str, family: int) -> [list, float]:
+        if aiodns is None:
+            return await self._getaddrinfo(host, family)
+        if self._aiodns is None:
+            self._aiodns = aiodns.DNSResolver()
+        # Записи A и AAAA запрашиваются одновременно, и медленный ответ на одну из них не отменяет адреса другой.
+        tasks = {asyncio.ensure_future(self._aiodns.query(host, query_type)): query_type
+                 for query_type in QUERY_TYPES.get(family, ('A',))}
+        done, pending = await asyncio.wait(tasks, timeout=self.timeout)
+        for task in pending:
+            task.cancel()
+        addresses, ttls = [], []
+        for task, query_type in tasks.items():
+            if task not in done:
+                continue
+            try:
+                records = task.result()
+            except aiodns.error.DNSError:
+                continue
+            address_family = socket.AF_INET if query_type == 'A' else socket.AF_INET6
+            addresses += [(address_family, record.host) for record in records]
+            ttls += [record.ttl for record in records]
+        if addresses:
+            return addresses, min(ttls)
+        # Запросы c-ares не читают /etc/hosts, поэтому localhost и имена только из файла hosts разрешаются
+        # через getaddrinfo.
+        return await self._getaddrinfo(host, family)
+
+    async def _getaddrinfo(self, host: str, family: int) -> [list, float]:
+        infos = await asyncio.wait_for(
+            asyncio.get_running_loop().getaddrinfo(host, None, family=family, type=socket.SOCK_STREAM), self.timeout)
+        return list(dict.fromkeys((info[0], info[4][0]) for info in infos)), self.default_ttl
@@ -0,0 +1,238 @@
+import glob
+import heapq
+import json
+import mmap
+import os
+import struct
+import time
+from collections import namedtuple
+
+# Формат одной записи журнала: время события, id цели, канал, тип события, класс ошибки,
+# HTTP код ответа, время ответа в секундах и значение (для окончания сбоя - его длительность по монотонным часам).
+RECORD = struct.Struct('<dIBBBxHfd2x')
+HEADER = b'CBREVT\x01\x00'.ljust(RECORD.size, b'\x00')
+
+# Каналы проверки.
+CHANNEL_IDS = {'website': 0, 'mobile': 1}
+CHANNEL_NAMES = {value: key for key, value in CHANNEL_IDS.items()}
+
+# Типы событий: результат проверки, начало сбоя, восстановление и сбой, не закрытый к концу мониторинга.
+SAMPLE, OUTAGE_START, OUTAGE_END, OUTAGE_CUTOFF = 0, 1, 2, 3
+
+# Классы ошибок проверки: нет ошибки, ошибка подключения или ответа, таймаут и ошибка разрешения имени в DNS.
+ERROR_NONE, ERROR_CONNECTION, ERROR_TIMEOUT, ERROR_DNS = 0, 1, 2, 3
+
+Event = namedtuple('Event', ['timestamp', 'target_id', 'channel', 'kind', 'error', 'status', 'latency', 'value'])
+
+
+def day_path(events_dir: str, day: int, shard: int = None) -> str:
+    """
+    Функция, возвращающая путь до журнала событий дня. Все события всех организаций за один день
+    хранятся в одном файле, а при мониторинге в нескольких процессах - в одном файле на шард.
+
+    Args:
+        events_dir (str): Папка журнала событий
+        day (int): День, для которого формируется отчет. То есть день 1, день 2 и т.п.
+        shard (int): Номер шарда или None при мониторинге в одном процессе
+
+    Returns:
+        str: Путь до файла журнала
+    """
+    if shard is None:
+        return os.path.join(events_dir, f'day{day}.bin')
+    return os.path.join(events_dir, f'day{day}.shard{shard}.bin')
+
+
+def checkpoint_path(events_dir: str, shard: int = None) -> str:
+    """
+    Функция, возвращающая путь до файла с открытыми сбоями, который сохраняет мониторинг в режиме daemon.
+
+    Args:
+        events_dir (str): Папка журнала событий
+        shard (int): Номер шарда или None при мониторинге в одном процессе
+
+    Returns:
+        str: Путь до файла
+    """
+    if shard is None:
+        return os.path.join(events_dir, 'checkpoint.json')
+    return os.path.join(events_dir, f'checkpoint.shard{shard}.json')
+
+
+class TargetCatalog:
+    """
+    Справочник организаций журнала событий. В записях журнала хранится только числовой id организации,
+    а справочник сопоставляет id с наименованием организации и сервиса. Id не меняются между днями,
+    поэтому справочник один на всю папку журнала.
+
+    Args:
+        events_dir (str): Папка журнала событий
+    """
+
+    def __init__(self, events_dir: str):
+        self.path = os.path.join(events_dir, 'targets.json')
+        self.organizations = {}
+        self._ids = {}
+        self.reload()
+
+    def reload(self) -> None:
+        """
+        Функция, перечитывающая справочник с диска, например после того, как его дополнил другой процесс.
+
+        Returns:
+            None
+        """
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as file:
+                self.organizations = {int(key): value for key, value in json.load(file).items()}
+        self._ids = {value['organisation_name']: key for key, value in self.organizations.items()}
+
+    def target_id(self, organisation: dict) -> int:
+        """
+        Функция, возвращающая id организации. Новая организация добавляется в справочник,
+        а у известной обновляется наименование сервиса, если оно изменилось.
+
+        Args:
+            organisation (dict): Словарь организации
+
+        Returns:
+            int: Id организации
+        """
+        name = organisation['organisation_name']
+        if name not in self._ids:
+            self._ids[name] = len(self.organizations)
+            self.organizations[self._ids[name]] = {
+                'organisation_name': name,
+                'service_name': organisation['service_name'],
+            }
+            self.save()
+        elif self.organizations[self._ids[name]]['service_name'] != organisation['service_name']:
+            self.organizations[self._ids[name]]['service_name'] = organisation['service_name']
+            self.save()
+        return self._ids[name]
+
+    def save(self) -> None:
+        """
+        Функция, атомарно сохраняющая справочник на диск.
+
+        Returns:
+            None
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.organizations, file, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+class EventWriter:
+    """
+    Журнал событий только на добавление. Каждое событие - запись фиксированного размера RECORD.size байт.
+    Записи копятся в буфере и записываются в файл, когда в буфере набирается flush_records записей или
+    при явном вызове flush. Файл синхронизируется с диском через fsync не чаще, чем раз в fsync_interval секунд.
+
+    Args:
+        path (str): Путь до файла журнала
+        flush_records (int): Сколько записей копится в буфере до записи в файл
+        fsync_interval (float): Период fsync в секундах
+    """
+
+    def __init__(self, path: str, flush_records: int = 256, fsync_interval: float = 5.0):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.flush_records = flush_records
+        self.fsync_interval = fsync_interval
+        self._file = open(path, 'ab', buffering=0)
+        size = self._file.tell()
+        if size < len(HEADER):
+            self._file.truncate(0)
+            self._file.write(HEADER)
+        elif (size - len(HEADER)) % RECORD.size:
+            # Отрезаем недописанную при аварийной остановке запись, чтобы новые записи не сместились.
+            self._file.truncate(size - (size - len(HEADER)) % RECORD.size)
+        self._buffer = bytearray()
+        self._last_fsync = time.monotonic()
+
+    def append(self, event: Event) -> None:
+        """
+        Функция, добавляющая событие в журнал.
+
+        Args:
+            event (Event): Событие: время (секунды с начала эпохи), id организации из TargetCatalog, id канала
+                           из CHANNEL_IDS, тип события (SAMPLE, OUTAGE_START, OUTAGE_END или OUTAGE_CUTOFF),
+                           класс ошибки, HTTP код ответа (0, если ответа нет), время ответа в секундах
+                           и длительность сбоя в секундах для OUTAGE_END и OUTAGE_CUTOFF
+
+        Returns:
+            None
+        """
+        self._buffer += RECORD.pack(*event)
+        if len(self._buffer) >= self.flush_records * RECORD.size:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Функция, записывающая буфер в файл и, если прошло fsync_interval секунд, синхронизирующая файл с диском.
+
+        Returns:
+            None
+        """
+        if self._buffer:
+            self._file.write(self._buffer)
+            self._buffer.clear()
+        if time.monotonic() - self._last_fsync >= self.fsync_interval:
+            os.fsync(self._file.fileno())
+            self._last_fsync = time.monotonic()
+
+    def close(self) -> None:
+        """
+        Функция, записывающая остаток буфера, синхронизирующая файл с диском и закрывающая его.
+
+        Returns:
+            None
+        """
+        self.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+
+def read_events(path: str, offset: int = 0):
+    """
+    Генератор, читающий события журнала через отображение файла в память. Незаписанный до конца
+    хвост файла (например, при аварийной остановке) пропускается.
+
+    Args:
+        path (str): Путь до файла журнала
+        offset (int): Сколько первых записей пропустить, например уже прочитанных ранее
+
+    Returns:
+        Итератор по Event
+    """
+    if not os.path.exists(path) or os.path.getsize(path) <= len(HEADER):
+        return
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if mm[:len(HEADER)] != HEADER:
+            raise ValueError(f'{path} не является журналом событий')
+        end = len(HEADER) + (len(mm) - len(HEADER)) // RECORD.size * RECORD.size
+        view = memoryview(mm)[min(len(HEADER) + offset * RECORD.size, end):end]
+        try:
+            for record in RECORD.iter_unpack(view):
+                yield Event(*record)
+        finally:
+            view.release()
+
+
+def read_day_events(events_dir: str, day: int):
+    """
+    Генератор, читающий события всех журналов дня: общего и журналов шардов. События разных журналов
+    сливаются по времени, а порядок событий внутри одного журнала сохраняется.
+
+    Args:
+        events_dir (str): Папка журнала событий
+        day (int): День, для которого формируется отчет. То есть день 1, день 2 и т.п.
+
+    Returns:
+        Итератор по Event
+    """
+    paths = [day_path(events_dir, day)] + sorted(glob.glob(os.path.join(events_dir, f'day{day}.shard*.bin')))
+    return heapq.merge(*(read_events(path) for path in paths), key=lambda event: event.timestamp)
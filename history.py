@@ -0,0 +1,470 @@
+"""
+Исторический индекс мониторинга за много дней.
+
+Журналы событий всех дней (events/day{N}.bin и журналы шардов) сводятся в базу SQLite: почасовые
+агрегаты проверок с гистограммами времени ответа и список сбоев. Запрос uptime, количества сбоев
+и перцентилей времени ответа по организации, каналу и периоду читает только почасовые строки периода,
+поэтому отвечает быстро и по данным за год.
+
+Запуск из корня проекта:
+    python history.py --organisation ВТБ --channel mobile --days 90
+    python history.py --start 2026-01-01 --end 2026-04-01
+"""
+import argparse
+import glob
+import heapq
+import math
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime
+
+from event_store import (CHANNEL_IDS, CHANNEL_NAMES, OUTAGE_CUTOFF, OUTAGE_END, OUTAGE_START, SAMPLE, TargetCatalog,
+                         read_events)
+from metrics import QUANTILES, LatencyHistogram
+
+# Почасовые агрегаты: сколько секунд в одной строке, и сколько часов в строке суточной гистограммы.
+BUCKET = 3600
+DAY_BUCKETS = 24
+
+# Имя файла журнала: день и необязательный номер шарда.
+JOURNAL_NAME = re.compile(r'day(\d+)(?:\.shard(\d+))?\.bin$')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS organizations (
+    target_id INTEGER PRIMARY KEY,
+    organisation_name TEXT NOT NULL,
+    service_name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS journals (
+    name TEXT PRIMARY KEY,
+    records INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS hourly (
+    target_id INTEGER NOT NULL,
+    channel INTEGER NOT NULL,
+    hour INTEGER NOT NULL,
+    probes INTEGER NOT NULL,
+    failures INTEGER NOT NULL,
+    latency_total REAL NOT NULL,
+    latency_max REAL NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    PRIMARY KEY (target_id, channel, hour)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS latency (
+    target_id INTEGER NOT NULL,
+    channel INTEGER NOT NULL,
+    hour INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (target_id, channel, hour, bucket)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS latency_daily (
+    target_id INTEGER NOT NULL,
+    channel INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (target_id, channel, day, bucket)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS outages (
+    target_id INTEGER NOT NULL,
+    channel INTEGER NOT NULL,
+    start REAL NOT NULL,
+    end REAL,
+    recovered INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (target_id, channel, start)
+) WITHOUT ROWID;
+'''
+
+
+class _HourStats:
+    def __init__(self, timestamp: float):
+        self.probes = 0
+        self.failures = 0
+        self.latency = LatencyHistogram()
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+
+
+def journal_paths(events_dir: str) -> list:
+    """
+    Функция, возвращающая журналы событий папки, упорядоченные по дню.
+
+    Args:
+        events_dir (str): Папка журнала событий
+
+    Returns:
+        list: Список [день, путь до журнала]
+    """
+    journals = []
+    for path in glob.glob(os.path.join(events_dir, 'day*.bin')):
+        match = JOURNAL_NAME.search(os.path.basename(path))
+        if match:
+            journals.append([int(match.group(1)), path])
+    return sorted(journals)
+
+
+class HistoryStore:
+    """
+    Исторический индекс мониторинга в базе SQLite. Индекс пополняется из журналов событий инкрементально:
+    для каждого журнала запоминается, сколько записей уже прочитано, поэтому повторный вызов ingest читает
+    только новые записи, в том числе дописанные работающим мониторингом. Проверки сводятся в почасовые строки
+    с количеством проверок и ошибок и гистограммой времени успешных ответов, а сбои хранятся интервалами.
+    Гистограммы дополнительно сводятся по суткам (UTC), поэтому запрос за длинный период читает
+    почасовые гистограммы только для неполных суток на краях периода.
+    Сбой, перенесенный через смену дня или перезапуск мониторинга в режиме daemon, хранится одним сбоем.
+    Папка базы создается, если ее еще нет, например до первого запуска мониторинга.
+
+    Args:
+        path (str): Путь до файла базы
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """
+        Функция, закрывающая базу.
+
+        Returns:
+            None
+        """
+        self.db.close()
+
+    def ingest(self, events_dir: str) -> int:
+        """
+        Функция, добавляющая в индекс новые записи всех журналов событий папки и справочник организаций.
+
+        Args:
+            events_dir (str): Папка журнала событий
+
+        Returns:
+            int: Количество прочитанных записей
+        """
+        catalog = TargetCatalog(events_dir)
+        offsets = dict(self.db.execute('SELECT name, records FROM journals'))
+        journals = journal_paths(events_dir)
+        total = 0
+        with self.db:
+            self.db.executemany('INSERT OR REPLACE INTO organizations VALUES (?, ?, ?)',
+                                [(target_id, value['organisation_name'], value['service_name'])
+                                 for target_id, value in catalog.organizations.items()])
+            for day in sorted({day for day, _ in journals}):
+                paths = [path for journal_day, path in journals if journal_day == day]
+                counts = dict.fromkeys(paths, 0)
+
+                def counted(path):
+                    for event in read_events(path, offsets.get(os.path.basename(path), 0)):
+                        counts[path] += 1
+                        yield event
+
+                self._ingest_events(heapq.merge(*(counted(path) for path in paths),
+                                                key=lambda event: event.timestamp))
+                for path, count in counts.items():
+                    if count:
+                        name = os.path.basename(path)
+                        self.db.execute('INSERT OR REPLACE INTO journals VALUES (?, ?)',
+                                        (name, offsets.get(name, 0) + count))
+                total += sum(counts.values())
+        return total
+
+    def _ingest_events(self, events) -> None:
+        hours = {}
+        for event in events:
+            if event.kind == SAMPLE:
+                key = (event.target_id, event.channel, int(event.timestamp // BUCKET))
+                stats = hours.get(key)
+                if stats is None:
+                    stats = hours[key] = _HourStats(event.timestamp)
+                stats.probes += 1
+                stats.last_seen = event.timestamp
+                if event.status == 0:
+                    stats.failures += 1
+                else:
+                    stats.latency.record(event.latency)
+            elif event.kind == OUTAGE_START:
+                self._open_outage(event.target_id, event.channel, event.timestamp)
+            elif event.kind in (OUTAGE_END, OUTAGE_CUTOFF):
+                self.db.execute('UPDATE outages SET end = ?, recovered = ? '
+                                'WHERE target_id = ? AND channel = ? AND end IS NULL',
+                                (event.timestamp, int(event.kind == OUTAGE_END), event.target_id, event.channel))
+        self.db.executemany('''
+            INSERT INTO hourly VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (target_id, channel, hour) DO UPDATE SET
+                probes = probes + excluded.probes, failures = failures + excluded.failures,
+                latency_total = latency_total + excluded.latency_total,
+                latency_max = max(latency_max, excluded.latency_max),
+                first_seen = min(first_seen, excluded.first_seen), last_seen = max(last_seen, excluded.last_seen)
+        ''', [(*key, stats.probes, stats.failures, stats.latency.total, stats.latency.max, stats.first_seen,
+               stats.last_seen) for key, stats in hours.items()])
+        self.db.executemany('''
+            INSERT INTO latency VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (target_id, channel, hour, bucket) DO UPDATE SET count = count + excluded.count
+        ''', [(*key, bucket, count) for key, stats in hours.items()
+              for bucket, count in enumerate(stats.latency.counts) if count])
+        days = {}
+        for (target_id, channel, hour), stats in hours.items():
+            counts = days.setdefault((target_id, channel, hour // DAY_BUCKETS), {})
+            for bucket, count in enumerate(stats.latency.counts):
+                if count:
+                    counts[bucket] = counts.get(bucket, 0) + count
+        self.db.executemany('''
+            INSERT INTO latency_daily VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (target_id, channel, day, bucket) DO UPDATE SET count = count + excluded.count
+        ''', [(*key, bucket, count) for key, counts in days.items() for bucket, count in counts.items()])
+
+    def _open_outage(self, target_id: int, channel: int, timestamp: float) -> None:
+        row = self.db.execute('SELECT start, end, recovered FROM outages WHERE target_id = ? AND channel = ? '
+                              'ORDER BY start DESC LIMIT 1', (target_id, channel)).fetchone()
+        if row is not None and row[1] is None:
+            return
+        # Сбой, закрытый на смене дня или при остановке, и открытый заново в тот же момент - это один сбой.
+        if row is not None and not row[2] and abs(row[1] - timestamp) < 1:
+            self.db.execute('UPDATE outages SET end = NULL WHERE target_id = ? AND channel = ? AND start = ?',
+                            (target_id, channel, row[0]))
+            return
+        self.db.execute('INSERT OR IGNORE INTO outages (target_id, channel, start) VALUES (?, ?, ?)',
+                        (target_id, channel, timestamp))
+
+    def organizations(self) -> dict:
+        """
+        Функция, возвращающая справочник организаций индекса.
+
+        Returns:
+            dict: Словарь id организации - [наименование организации, наименование сервиса]
+        """
+        return {target_id: [name, service] for target_id, name, service in
+                self.db.execute('SELECT target_id, organisation_name, service_name FROM organizations')}
+
+    def query(self, start: float, end: float, organisation: str = None, channel: str = None) -> list:
+        """
+        Функция, возвращающая статистику ссылок за период [start, end]: количество проверок и ошибок,
+        время мониторинга и недоступности, uptime, количество сбоев и перцентили времени успешных ответов.
+        Uptime считается от времени, когда ссылка действительно проверялась, поэтому перерывы в мониторинге
+        не считаются ни доступностью, ни недоступностью. Незакрытый сбой считается до последней проверки ссылки,
+        поэтому сбой, оборванный аварийной остановкой мониторинга, не растет до текущего времени.
+        Количество проверок и перцентили времени ответа считаются с точностью до часа: учитываются все проверки
+        часов, пересекающихся с периодом.
+
+        Args:
+            start (float): Начало периода, секунды с начала эпохи
+            end (float): Конец периода, секунды с начала эпохи
+            organisation (str): Наименование организации без учета регистра, None - все организации
+            channel (str): Канал проверки, website или mobile, None - оба канала
+
+        Returns:
+            list: Список словарей, по одному на организацию и канал
+
+        Raises:
+            ValueError: Если организации или канала нет в индексе
+        """
+        organizations = self.organizations()
+        target_ids = sorted(organizations)
+        if organisation is not None:
+            target_ids = [target_id for target_id in target_ids
+                          if organizations[target_id][0].lower() == organisation.lower()]
+            if not target_ids:
+                raise ValueError(f'Организации {organisation} нет в индексе')
+        if channel is not None and channel not in CHANNEL_IDS:
+            raise ValueError(f'Неизвестный канал {channel}, допустимы {", ".join(CHANNEL_IDS)}')
+        channels = [CHANNEL_IDS[channel]] if channel is not None else sorted(CHANNEL_NAMES)
+        first_hour, last_hour = int(start // BUCKET), math.ceil(end / BUCKET) - 1
+        result = []
+        for target_id in target_ids:
+            for channel_id in channels:
+                probes, failures, latency_total, latency_max = self.db.execute(
+                    'SELECT SUM(probes), SUM(failures), SUM(latency_total), MAX(latency_max) FROM hourly '
+                    'WHERE target_id = ? AND channel = ? AND hour BETWEEN ? AND ?',
+                    (target_id, channel_id, first_hour, last_hour)).fetchone()
+                if not probes:
+                    continue
+                outages = self.db.execute('SELECT start, end FROM outages WHERE target_id = ? AND channel = ? '
+                                          'AND start < ? AND (end IS NULL OR end > ?)',
+                                          (target_id, channel_id, end, start)).fetchall()
+                if any(outage_end is None for _, outage_end in outages):
+                    last_seen = self.db.execute('SELECT MAX(last_seen) FROM hourly WHERE target_id = ? '
+                                                'AND channel = ?', (target_id, channel_id)).fetchone()[0]
+                    outages = [[outage_start, last_seen if outage_end is None else outage_end]
+                               for outage_start, outage_end in outages]
+                outages = [[max(start, outage_start), min(end, outage_end)] for outage_start, outage_end in outages]
+                downtime = sum(max(0.0, outage_end - outage_start) for outage_start, outage_end in outages)
+                monitored = self._monitored(target_id, channel_id, outages, start, end)
+                latency = self._latency(target_id, channel_id, first_hour, last_hour)
+                latency.total, latency.max = latency_total, latency_max
+                row = {
+                    'organisation_name': organizations[target_id][0],
+                    'service_name': organizations[target_id][1],
+                    'channel': CHANNEL_NAMES[channel_id],
+                    'probes': probes,
+                    'failures': failures,
+                    'monitored': monitored,
+                    'downtime': downtime,
+                    'uptime': (monitored - downtime) / monitored * 100 if monitored > 0 else 100.0,
+                    'outages': len(outages),
+                    'latency_mean': latency.mean(),
+                    'latency_max': latency.max,
+                }
+                for quantile, value in zip(QUANTILES, latency.percentiles(QUANTILES)):
+                    row[f'p{quantile}'] = value
+                result.append(row)
+        return result
+
+    def _monitored(self, target_id: int, channel: int, outages: list, start: float, end: float) -> float:
+        # Подряд идущие часы с проверками - непрерывный мониторинг от первой до последней проверки, поэтому
+        # перерывы между запусками мониторинга не попадают во время мониторинга. Сбои тоже считаются временем
+        # мониторинга, даже если после последней проверки сбоя прошло время.
+        intervals = list(outages)
+        run_hour = run_start = run_end = None
+        for hour, first_seen, last_seen in self.db.execute(
+                'SELECT hour, first_seen, last_seen FROM hourly WHERE target_id = ? AND channel = ? '
+                'AND hour BETWEEN ? AND ? ORDER BY hour',
+                (target_id, channel, int(start // BUCKET) - 1, math.ceil(end / BUCKET))):
+            if run_hour is None or hour != run_hour + 1:
+                if run_hour is not None:
+                    intervals.append([max(run_start, start), min(run_end, end)])
+                run_start = first_seen
+            run_hour, run_end = hour, last_seen
+        if run_hour is not None:
+            intervals.append([max(run_start, start), min(run_end, end)])
+        total, covered = 0.0, -math.inf
+        for low, high in sorted(intervals):
+            low = max(low, covered)
+            if high > low:
+                total += high - low
+                covered = high
+        return total
+
+    def _latency(self, target_id: int, channel: int, first_hour: int, last_hour: int) -> LatencyHistogram:
+        # Полные сутки периода берутся из суточных гистограмм, а неполные сутки на краях - из почасовых.
+        first_day, last_day = -(-first_hour // DAY_BUCKETS), (last_hour + 1) // DAY_BUCKETS - 1
+        if first_day <= last_day:
+            ranges = [('latency_daily', 'day', first_day, last_day),
+                      ('latency', 'hour', first_hour, first_day * DAY_BUCKETS - 1),
+                      ('latency', 'hour', (last_day + 1) * DAY_BUCKETS, last_hour)]
+        else:
+            ranges = [('latency', 'hour', first_hour, last_hour)]
+        rows = []
+        for table, column, first, last in ranges:
+            if first <= last:
+                rows += self.db.execute(f'SELECT bucket, SUM(count) FROM {table} WHERE target_id = ? '
+                                        f'AND channel = ? AND {column} BETWEEN ? AND ? GROUP BY bucket',
+                                        (target_id, channel, first, last)).fetchall()
+        histogram = LatencyHistogram()
+        for bucket, count in rows:
+            histogram.counts[bucket] += count
+            histogram.count += count
+        return histogram
+
+
+# Колонки вывода: ключ результата, заголовок и формат значения.
+COLUMNS = (
+    ('organisation_name', 'организация', '{}'),
+    ('channel', 'канал', '{}'),
+    ('probes', 'проверок', '{:d}'),
+    ('failures', 'ошибок', '{:d}'),
+    ('uptime', 'uptime %', '{:.3f}'),
+    ('downtime', 'недоступность с', '{:.0f}'),
+    ('outages', 'сбоев', '{:d}'),
+    ('p50', 'p50 мс', '{:.0f}'),
+    ('p95', 'p95 мс', '{:.0f}'),
+    ('p99', 'p99 мс', '{:.0f}'),
+)
+
+
+def format_table(rows: list) -> str:
+    """
+    Функция, форматирующая результат запроса в текстовую таблицу.
+
+    Args:
+        rows (list): Результат HistoryStore.query
+
+    Returns:
+        str: Таблица
+    """
+    cells = [[title for _, title, _ in COLUMNS]]
+    for row in rows:
+        values = {**row, **{f'p{quantile}': row[f'p{quantile}'] * 1000 for quantile in QUANTILES}}
+        cells.append([value_format.format(values[key]) for key, _, value_format in COLUMNS])
+    widths = [max(len(row[column]) for row in cells) for column in range(len(COLUMNS))]
+    return '\n'.join('  '.join(cell.rjust(width) for cell, width in zip(row, widths)) for row in cells)
+
+
+def parse_time(value: str) -> float:
+    """
+    Функция, разбирающая время из командной строки в формате ГГГГ-ММ-ДД или ГГГГ-ММ-ДД ЧЧ:ММ (локальное время).
+
+    Args:
+        value (str): Время
+
+    Returns:
+        float: Секунды с начала эпохи
+    """
+    for time_format in ('%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, time_format).timestamp()
+        except ValueError:
+            continue
+    raise argparse.ArgumentTypeError(f'Неверное время {value}, ожидается ГГГГ-ММ-ДД или ГГГГ-ММ-ДД ЧЧ:ММ')
+
+
+def parse_args(args: list = None) -> argparse.Namespace:
+    """
+    Функция, разбирающая аргументы командной строки запроса к историческому индексу.
+
+    Args:
+        args (list): Аргументы командной строки, по умолчанию sys.argv[1:]
+
+    Returns:
+        argparse.Namespace: Параметры запроса
+    """
+    parser = argparse.ArgumentParser(description='Запрос к историческому индексу мониторинга')
+    parser.add_argument('--events-dir', default='events', help='Папка журнала событий')
+    parser.add_argument('--db', help='Файл индекса, по умолчанию history.sqlite в папке журнала событий')
+    parser.add_argument('--organisation', help='Наименование организации, по умолчанию все организации')
+    parser.add_argument('--channel', choices=sorted(CHANNEL_IDS), help='Канал, по умолчанию оба канала')
+    parser.add_argument('--days', type=float, default=1, help='Период - последние days дней, если не указан --start')
+    parser.add_argument('--start', type=parse_time, help='Начало периода: ГГГГ-ММ-ДД или ГГГГ-ММ-ДД ЧЧ:ММ')
+    parser.add_argument('--end', type=parse_time, help='Конец периода, по умолчанию сейчас')
+    parser.add_argument('--no-ingest', action='store_true', help='Не дополнять индекс новыми записями журналов')
+    return parser.parse_args(args)
+
+
+def main(args: list = None) -> None:
+    """
+    Основная функция: дополняет индекс новыми записями журналов, если не указан --no-ingest, выполняет
+    запрос за период и выводит таблицу uptime, сбоев и времени ответа по организациям и каналам.
+
+    Args:
+        args (list): Аргументы командной строки, по умолчанию sys.argv[1:]
+
+    Returns:
+        None
+    """
+    args = parse_args(args)
+    path = args.db or os.path.join(args.events_dir, 'history.sqlite')
+    try:
+        store = HistoryStore(path)
+    except (OSError, sqlite3.Error) as e:
+        raise SystemExit(f'Не удалось открыть базу {path}: {e}')
+    try:
+        if not args.no_ingest:
+            store.ingest(args.events_dir)
+        end = args.end if args.end is not None else time.time()
+        start = args.start if args.start is not None else end - args.days * 86400
+        try:
+            rows = store.query(start, end, args.organisation, args.channel)
+        except ValueError as e:
+            raise SystemExit(str(e))
+    finally:
+        store.close()
+    print(format_table(rows))
+
+
+if __name__ == '__main__':
+    main()
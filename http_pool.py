@@ -0,0 +1,133 @@
+import asyncio
+
+import aiohttp
+import requests
+from aiohttp.abc import AbstractResolver
+from requests.adapters import HTTPAdapter
+
+# Способы проверки ссылки: полный GET, HEAD без тела ответа и GET только первого байта.
+PROBE_METHODS = ('get', 'head', 'range')
+
+# Сколько байт тела ответа дочитывается, чтобы вернуть соединение в пул. Если тело больше,
+# то соединение закрывается, чтобы не скачивать целиком большие страницы.
+MAX_DRAIN_BYTES = 64 * 1024
+
+# Фазы запроса, время которых измеряется трассировкой aiohttp. Время connect включает TLS рукопожатие,
+# так как aiohttp не выделяет его в отдельное событие трассировки. Время ttfb считается от отправки заголовков
+# запроса до получения заголовков ответа, поэтому не включает DNS и подключение.
+TRACE_PHASES = {
+    'dns': ('on_dns_resolvehost_start', 'on_dns_resolvehost_end'),
+    'connect': ('on_connection_create_start', 'on_connection_create_end'),
+    'ttfb': ('on_request_headers_sent', 'on_request_end'),
+}
+
+_telegram_session = None
+
+
+def get_telegram_session() -> requests.Session:
+    """
+    Функция, возвращающая общую для всех вызовов Telegram Api сессию requests. Сессия держит
+    keep-alive соединение с api.telegram.org, поэтому каждое сообщение не платит за новое
+    TCP и TLS соединение.
+
+    Returns:
+        requests.Session: Сессия с пулом соединений
+    """
+    global _telegram_session
+    if _telegram_session is None:
+        session = requests.Session()
+        session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        _telegram_session = session
+    return _telegram_session
+
+
+def _trace_phase(timings_key: str, is_end: bool):
+    async def callback(session, trace_config_ctx, params) -> None:
+        timings = trace_config_ctx.trace_request_ctx
+        if timings is None:
+            return
+        now = asyncio.get_running_loop().time()
+        if is_end:
+            timings[timings_key] = timings.get(timings_key, 0.0) + now - timings.pop(f'_{timings_key}', now)
+        else:
+            timings[f'_{timings_key}'] = now
+    return callback
+
+
+def create_trace_config() -> aiohttp.TraceConfig:
+    """
+    Функция, создающая трассировку aiohttp, которая записывает время фаз запроса TRACE_PHASES в словарь,
+    переданный в запрос как trace_request_ctx. Если фаза повторяется (например, при редиректе на другой
+    хост), то ее время суммируется. Время фазы connect включает время DNS.
+
+    Returns:
+        aiohttp.TraceConfig: Трассировка запросов
+    """
+    trace_config = aiohttp.TraceConfig()
+    for phase, (start_signal, end_signal) in TRACE_PHASES.items():
+        getattr(trace_config, start_signal).append(_trace_phase(phase, False))
+        getattr(trace_config, end_signal).append(_trace_phase(phase, True))
+    return trace_config
+
+
+def create_probe_session(timeout: int, limit: int, limit_per_host: int, keepalive_timeout: int,
+                         resolver: AbstractResolver = None) -> aiohttp.ClientSession:
+    """
+    Функция, создающая сессию aiohttp для проверок с общим пулом keep-alive соединений
+    и трассировкой времени фаз запроса.
+
+    Args:
+        timeout (int): Таймаут подключения и чтения в секундах
+        limit (int): Максимальное количество соединений в пуле
+        limit_per_host (int): Максимальное количество соединений к одному хосту
+        keepalive_timeout (int): Сколько секунд неиспользуемое соединение остается в пуле
+        resolver (AbstractResolver): Резолвер DNS со своим кешем, см. dns_cache.CachingResolver. Если он задан,
+                                     то встроенный кеш aiohttp с фиксированным TTL отключается
+
+    Returns:
+        aiohttp.ClientSession: Сессия для проверок
+    """
+    connector = aiohttp.TCPConnector(limit=limit, limit_per_host=limit_per_host,
+                                     keepalive_timeout=keepalive_timeout, resolver=resolver,
+                                     use_dns_cache=resolver is None)
+    return aiohttp.ClientSession(connector=connector,
+                                 timeout=aiohttp.ClientTimeout(sock_connect=timeout, sock_read=timeout),
+                                 trace_configs=[create_trace_config()])
+
+
+async def fetch_status(session: aiohttp.ClientSession, link: str, method: str = 'range',
+                       timings: dict = None, timeout: float = None) -> int:
+    """
+    Функция, выполняющая запрос к ссылке и возвращающая HTTP код ответа. Для method="head"
+    выполняется HEAD запрос, для method="range" GET с заголовком Range на первый байт,
+    для method="get" GET со скачиванием всей страницы. Если сервер игнорирует Range и отдает
+    большое тело, то соединение закрывается вместо скачивания всей страницы.
+
+    Args:
+        session (aiohttp.ClientSession): Сессия для проверок
+        link (str): Проверяемая ссылка
+        method (str): Способ проверки: get, head или range
+        timings (dict): Словарь, в который трассировка запишет время фаз запроса в секундах
+        timeout (float): Таймаут подключения и чтения в секундах, None - таймаут сессии
+
+    Returns:
+        int: HTTP код ответа
+    """
+    options = {'trace_request_ctx': timings}
+    if timeout is not None:
+        options['timeout'] = aiohttp.ClientTimeout(sock_connect=timeout, sock_read=timeout)
+    if method == 'head':
+        async with session.head(link, allow_redirects=True, **options) as response:
+            return response.status
+    if method == 'get':
+        async with session.get(link, **options) as response:
+            await response.read()
+            return response.status
+    async with session.get(link, headers={'Range': 'bytes=0-0'}, **options) as response:
+        drained = 0
+        async for chunk in response.content.iter_any():
+            drained += len(chunk)
+            if drained > MAX_DRAIN_BYTES:
+                response.close()
+                break
+        return response.status
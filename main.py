@@ -1,401 +1,825 @@
-import requests
-import time
-import pandas as pd
-import yaml
-from pathlib import Path
-import os
-import threading
+import argparse
+import asyncio
 import csv
+import datetime
 import logging
+import math
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING
+
+from event_store import TargetCatalog, checkpoint_path, day_path, read_day_events, read_events
+from uptime_stats import UptimeAggregator
+
+# Тяжелые зависимости (aiohttp, requests, pandas, yaml) импортируются внутри функций, которым они нужны,
+# поэтому построение отчета и справка по командам не платят за импорт движка мониторинга.
+if TYPE_CHECKING:
+    from probe_engine import ProbeEngine
+
+path_to_config = 'config.yml'
+
+# SIGHUP, полученный процессом шарда до готовности его движка, см. hold_reload_signal.
+_reload_requested = threading.Event()
 
 
-def get_telegram_info_from_config(path: str) -> [str, str]:
+def get_monitor_settings_from_config(path: str) -> dict:
     """
-    Функция, работающая с config.yml файлом для получения chat_id
-    и telegram_token бота. Данная функция нужна, чтобы нельзя было
-    в GitHub прочитать token и chat_id, так как они в виде str
-    хранятся в конфиге, которы не загружается на GitHub.
+    Функция, читающая из config.yml настройки мониторинга и данные Telegram бота.
+    Если настройка в конфиге не указана, то используется значение по умолчанию.
 
     Args:
         path (str): Путь до config.yml
 
     Returns:
-        [str, str]: telegram_token и chat_id
+        dict: Настройки мониторинга
     """
+    import yaml
+
     with open(path) as file:
         config = yaml.safe_load(file)
-        return config['telegram_token'], config['telegram_chat_id']
+    return {
+        'telegram_token': config['telegram_token'],
+        'telegram_chat_id': config['telegram_chat_id'],
+        'max_concurrent_probes': config.get('max_concurrent_probes', 500),
+        'probe_method': config.get('probe_method', 'range'),
+        'max_connections_per_host': config.get('max_connections_per_host', 4),
+        'keepalive_timeout': config.get('keepalive_timeout', 30),
+        'max_failing_interval': config.get('max_failing_interval', 20),
+        'failing_backoff': config.get('failing_backoff', 1.5),
+        'probe_jitter': config.get('probe_jitter', 0.1),
+        'events_dir': config.get('events_dir', 'events'),
+        'metrics_port': config.get('metrics_port', 9108),
+        'telegram_api_url': config.get('telegram_api_url', 'https://api.telegram.org'),
+        'notification_batch_window': config.get('notification_batch_window', 2.0),
+        'notifications_per_minute': config.get('notifications_per_minute', 20),
+        'workers': config.get('workers', 1) or os.cpu_count(),
+        'daemon': config.get('daemon', False),
+        'rollover_time': config.get('rollover_time', '00:00'),
+        'dns_ttl': config.get('dns_ttl', 60),
+        'dns_negative_ttl': config.get('dns_negative_ttl', 5),
+        'dns_prefetch': config.get('dns_prefetch', True),
+        'targets_path': config.get('targets_path', 'targets.yml'),
+        'targets_reload_interval': config.get('targets_reload_interval', 5),
+        'outage_confirmations': config.get('outage_confirmations', 2),
+        'breaker_threshold': config.get('breaker_threshold', 5),
+        'breaker_cooldown': config.get('breaker_cooldown', 20),
+        'breaker_max_cooldown': config.get('breaker_max_cooldown', 120),
+    }
 
 
-def send_telegram_message(message: str) -> None:
+def telegram_credentials(settings: dict) -> [str, str, str]:
     """
-    Функция, отправляющая сообщение с помощью telegram_token
-    в чат с chat_id  с помощью GET метода.
+    Функция, возвращающая данные Telegram бота и адрес Telegram Api из настроек мониторинга.
 
     Args:
-        message (str): Сообщение, которое будет отправлено в Telegram
+        settings (dict): Настройки мониторинга из config.yml
 
     Returns:
-        None
+        [str, str, str]: telegram_token, chat_id и адрес Telegram Api
     """
-    base_url = f"https://api.telegram.org/bot{telegram_token}/sendMessage"
-    parameters = {
-        "chat_id": telegram_chat_id,
-        "text": message
-    }
-    requests.get(base_url, data=parameters)
+    return settings['telegram_token'], settings['telegram_chat_id'], settings['telegram_api_url']
 
 
-def send_telegram_csv_document(file) -> None:
+def send_telegram_csv_document(file, telegram_token: str, telegram_chat_id: str,
+                               api_url: str = 'https://api.telegram.org', timeout: float = 60) -> None:
     """
     Функция, отправляющая ежедневный отчет формата .csv в Telegram
 
     Args:
         file: Путь до отчет.csv
+        telegram_token (str): telegram_token бота
+        telegram_chat_id (str): chat_id канала
+        api_url (str): Адрес Telegram Api, например локального сервера-заглушки
+        timeout (float): Таймаут подключения и чтения в секундах, чтобы зависший Telegram Api не задерживал
+            завершение мониторинга
 
     Returns:
         None
     """
-    base_url = f"https://api.telegram.org/bot{telegram_token}/sendDocument"
-    my_file = open(f"{file}", "rb")
+    from http_pool import get_telegram_session
+
+    base_url = f"{api_url.rstrip('/')}/bot{telegram_token}/sendDocument"
     parameters = {
         "chat_id": telegram_chat_id,
         "caption": "This is daily report"
     }
-    files = {
-        "document": my_file
-    }
-    requests.get(base_url, data=parameters, files=files)
+    with open(f"{file}", "rb") as my_file:
+        files = {
+            "document": my_file
+        }
+        get_telegram_session().get(base_url, data=parameters, files=files, timeout=timeout)
 
 
-path_to_config = 'config.yml'
-telegram_token, telegram_chat_id = get_telegram_info_from_config(path_to_config)
-logging.basicConfig(level=logging.INFO)
-
-# Список организаций.
-organizations = [
-    {
-        'organisation_name': 'Сбербанк',
-        'service_name': 'Кредиты на любые цели',
-        'service_link': 'https://www.sberbank.com/ru/person/credits/money',
-        'mobile_service_link': 'https://online.sberbank.ru/CSAFront/index.do'
-    },
-    {
-        'organisation_name': 'Альфа-Банк',
-        'service_name': 'Потребительские кредиты',
-        'service_link': 'https://www.sberbank.com/ru/person/credits/money',
-        'mobile_service_link': 'https://business.auth.alfabank.ru/passport/cerberus-mini-blue/dashboard-blue/corp-username?response_type=code&client_id=corp-albo&scope=openid%20corp-albo&acr_values=corp-username&non_authorized_user=true',
-    },
-    {
-        'organisation_name': 'ВБРР',
-        'service_name': 'Потребительские кредиты',
-        'service_link': 'https://www.vbrr.ru/private/credits/loan/',
-        'mobile_service_link': 'https://online.vbrr.ru/#/',
-    },
-    {
-        'organisation_name': 'Банк Открытие',
-        'service_name': 'Кредит на любые цели',
-        'service_link': 'https://www.open.ru/credits/cash?from=main_menu',
-        'mobile_service_link': 'https://ib.open.ru/webbank/#/login',
-    },
-    {
-        'organisation_name': 'ВТБ',
-        'service_name': 'Потребительские кредиты',
-        'service_link': 'https://www.vtb.ru/personal/kredit/',
-        'mobile_service_link': 'https://online.vtb.ru/login',
-    },
-    {
-        'organisation_name': 'ИНГОССТРАХ',
-        'service_name': 'Страхование для путешествия за границу',
-        'service_link': 'https://www.ingos.ru/travel/abroad',
-        'mobile_service_link': 'https://www.ingos.ru/cabinet',
-    },
-    {
-        'organisation_name': 'Ренессанс_страхование',
-        'service_name': 'Онлайн страхование путешественников',
-        'service_link': 'https://www.renins.ru/iris/di/process/travelinsurance/ZDM-200623-621#TravelSegmentationStep',
-        'mobile_service_link': 'https://lk.renins.ru/login',
-    },
-    {
-        'organisation_name': 'РЕСО-Гарантия',
-        'service_name': 'Туристическая страховка',
-        'service_link': 'https://reso.ru/individual/travel/',
-        'mobile_service_link': 'https://client.reso.ru/wp-reso-ru/login.xhtml',
-    },
-    {
-        'organisation_name': 'АльфаСтрахование',
-        'service_name': 'Туристическая страховка',
-        'service_link': 'https://www.alfastrah.ru/individuals/travel/',
-        'mobile_service_link': 'https://www.alfastrah.ru/login/',
-    },
-    {
-        'organisation_name': 'Сбербанк_страхование',
-        'service_name': 'Страхование путешественников',
-        'service_link': 'https://sberbankins.ru/products/travel-online/',
-        'mobile_service_link': 'https://auth.sberbankins.ru/auth/realms/insure-app/protocol/openid-connect/auth?client_id=lk-app&redirect_uri=https%3A%2F%2Fonline.sberbankins.ru%2Fnewlk%2F&state=c82d0192-48bd-48cc-a5bd-adaca1f4a030&response_mode=fragment&response_type=code&scope=openid&nonce=c5a0c6b6-6cc9-42fc-a1da-5af9df23ee9c',
-    }
-]
+def format_uptime(uptime: float, downtime: float) -> float:
+    """
+    Функция, округляющая uptime в процентах до 2 знаков после запятой. Если недоступности не было,
+    то возвращается ровно 100.
+
+    Args:
+        uptime (float): Uptime в процентах
+        downtime (float): Время недоступности в секундах
+
+    Returns:
+        float: Uptime в процентах
+    """
+    if round(downtime) == 0:
+        return 100
+    return float("{:.2f}".format(uptime))
 
 
-def check_organisation_service_link(organisation: dict, day: int, start_time: float) -> None:
+def build_report_table(stats: UptimeAggregator, catalog: TargetCatalog, start: float, end: float,
+                       now: float = None) -> dict:
     """
-    Функция, которая проверяет доступность ссылки веб-сайта, каждые 10 секунд, если выдается ошибка, то
-    тогда проверяется тогда ссылка, проверяется, каждые 5 секунд. Данные события также записываются
-    в текстовые файлы в определенном формате, чтобы потом можно было из них сделать отчет. Данная функция
-    включает в себя бесконечный цикл, который прерывается после того как проходит 24 часа. В случае возникновения
-    ошибки приходит сообщение в телеграм, когда работа сервиса восстанавливается, то приходит сообщение о восстановлении.
-    Также, чтобы не присылать только первое уведомление, что произошел сбой, а затем только при восстановлении была
-    сделана условная конструкция. Также в ходе работы логи выводятся в консоль.
+    Функция, строящая таблицу отчета за окно [start, end] по накопительной статистике доступности.
+    Журнал событий при этом не читается, поэтому отчет за последний час, сегодня или скользящие 24 часа
+    можно построить в любой момент работы мониторинга.
 
     Args:
-        organisation (dict): Словарь вида {наименование организации: "str", наименование сервиса: "str",
-                                           ссылка на веб-сайт: "str", ссылка на мобильное приложение: "str"}
-        day (int): День, для которого формируется отчет. То есть день 1, день 2 и т.п.
-        start_time (float): Начальное время, которые используется для засечения таймера на 24 часа
+        stats (UptimeAggregator): Накопительная статистика доступности
+        catalog (TargetCatalog): Справочник организаций журнала событий
+        start (float): Начало окна, секунды с начала эпохи
+        end (float): Конец окна, секунды с начала эпохи
+        now (float): Текущее время, до которого считаются открытые сбои, по умолчанию time.time()
+
     Returns:
-        None
+        dict: Столбцы отчета
     """
-    timeout, sleep_time, connection_error_time, error_count = 2, 10, 0, 0
-    while True:
-        if time.time() - start_time >= 86400:
-            if connection_error_time != 0:
-                with open(f"logs{day}/website/total_time_errors_{organisation['organisation_name']}.txt", "a") as b:
-                    b.write(f'{str(connection_error_time)}\n')
-            break
-        now = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
-        try:
-            status_code = requests.get(organisation['service_link'], timeout=timeout).status_code
-            if status_code:
-                logging.info(f"{organisation['service_link']} - {status_code} - {now}")
-
-            if connection_error_time != 0:
-                error_count = 0
-                message = f"{organisation['organisation_name']} - {organisation['service_name']} - {organisation['service_link']} - {now} - Восстановление"
-                send_telegram_message(message)
-                with open(f"logs{day}/website/errors_{organisation['organisation_name']}.txt", "a") as f:
-                    f.write(f'{message}\n')
-                with open(f"logs{day}/website/total_time_errors_{organisation['organisation_name']}.txt", "a") as b:
-                    b.write(f'{str(connection_error_time)}\n')
-                connection_error_time, sleep_time = 0, 10
-
-        except requests.exceptions.RequestException as e:
-            logging.info(f"{e} {now}")
-            error_count += 1
-            connection_error_time += 7
-            if error_count == 1:
-                message = f"{organisation['organisation_name']} - {organisation['service_name']} - {organisation['service_link']} - {now} - {e}"
-                send_telegram_message(message)
-                with open(f"logs{day}/website/errors_{organisation['organisation_name']}.txt", "a") as f:
-                    f.write(f'{message}\n')
-            sleep_time = 5
-        time.sleep(sleep_time)
-
-
-def check_organisation_mobile_service_link(organisation: dict, day: int, start_time: float) -> None:
-    """
-    Функция, которая проверяет доступность ссылки аутентификации, каждые 10 секунд, если выдается ошибка, то
-    тогда проверяется тогда ссылка, проверяется, каждые 5 секунд. Данные события также записываются
-    в текстовые файлы в определенном формате, чтобы потом можно было из них сделать отчет. Данная функция
-    включает в себя бесконечный цикл, который прерывается после того как проходит 24 часа. В случае возникновения
-    ошибки приходит сообщение в телеграм, когда работа сервиса восстанавливается, то приходит сообщение о восстановлении.
-    Также, чтобы не присылать только первое уведомление, что произошел сбой, а затем только при восстановлении была
-    сделана условная конструкция. Также в ходе работы логи выводятся в консоль.
+    organisation_names, uptime_website, uptime_mobile = [], [], []
+    errors_website_info, errors_mobile_info, total_mobile_and_website_time_errors = [], [], []
+    for target_id in sorted({target_id for target_id, _ in stats.series}):
+        organisation = catalog.organizations.get(target_id, {'organisation_name': f'Организация {target_id}',
+                                                             'service_name': '-'})
+        organisation_names.append(organisation['organisation_name'])
+        total_time_errors = 0
+        for channel, uptime, errors in (('website', uptime_website, errors_website_info),
+                                        ('mobile', uptime_mobile, errors_mobile_info)):
+            downtime = stats.downtime(target_id, channel, start, end, now)
+            total_time_errors += round(downtime)
+            uptime.append(format_uptime(stats.uptime(target_id, channel, start, end, now), downtime))
+            outages = stats.outages(target_id, channel, start, end)
+            if not outages:
+                errors.append('-')
+                continue
+            info = [organisation['service_name']]
+            for outage_start, outage_end in outages:
+                info.append(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(outage_start))} "
+                            f"прекращения работы сервиса")
+                if outage_end is not None:
+                    info.append(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(outage_end))} "
+                                f"восстановления работы сервиса")
+            errors.append(' - '.join(info))
+        total_mobile_and_website_time_errors.append(total_time_errors)
+
+    return {'Перечень организаций': organisation_names,
+            'Uptime сайта': uptime_website,
+            'Uptime мобильного приложения': uptime_mobile,
+            'Время недоступности сайта': errors_website_info,
+            'Время недоступности мобильного приложения': errors_mobile_info,
+            'Суммарное время недоступности сервиса': total_mobile_and_website_time_errors}
+
+
+def load_stats_from_events(events_dir: str, day: int, shard: int = None) -> UptimeAggregator:
+    """
+    Функция, восстанавливающая накопительную статистику доступности дня за один проход по журналу событий.
+    Нужна, когда отчет строится не в том процессе, который вел мониторинг. При мониторинге в нескольких
+    процессах журналы всех шардов сливаются в одну статистику, если только не указан один шард.
 
     Args:
-        organisation (dict): Словарь вида {наименование организации: "str", наименование сервиса: "str",
-                                           ссылка на веб-сайт: "str", ссылка на мобильное приложение: "str"}
+        events_dir (str): Папка журнала событий
         day (int): День, для которого формируется отчет. То есть день 1, день 2 и т.п.
-        start_time (float): Начальное время, которые используется для засечения таймера на 24 часа
+        shard (int): Номер шарда, журнал которого нужно прочитать, None - все журналы дня
+
     Returns:
-        None
+        UptimeAggregator: Накопительная статистика доступности
     """
-    timeout, sleep_time, connection_error_time, error_count = 2, 10, 0, 0
-    while True:
-        if time.time() - start_time >= 86400:
-            if connection_error_time != 0:
-                with open(f"logs{day}/mobile/total_time_errors_{organisation['organisation_name']}.txt", "a") as b:
-                    b.write(f'{str(connection_error_time)}\n')
-            break
-        now = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
-        try:
-            status_code = requests.get(organisation['mobile_service_link'], timeout=timeout).status_code
-            if status_code:
-                logging.info(f"{organisation['service_link']} - {status_code} - {now}")
-
-            if connection_error_time != 0:
-                error_count = 0
-                message = f"{organisation['organisation_name']} - {organisation['service_name']} - {organisation['mobile_service_link']} - {now} - Восстановление"
-                send_telegram_message(message)
-                with open(f"logs{day}/mobile/errors_{organisation['organisation_name']}.txt", "a") as f:
-                    f.write(f'{message}\n')
-                with open(f"logs{day}/mobile/total_time_errors_{organisation['organisation_name']}.txt", "a") as b:
-                    b.write(f'{str(connection_error_time)}\n')
-                connection_error_time, sleep_time = 0, 10
-
-        except requests.exceptions.RequestException as e:
-            logging.info(f"{e} {now}")
-            error_count += 1
-            connection_error_time += 7
-            if error_count == 1:
-                message = f"{organisation['organisation_name']} - {organisation['service_name']} - {organisation['mobile_service_link']} - {now} - {e}"
-                send_telegram_message(message)
-                with open(f"logs{day}/mobile/errors_{organisation['organisation_name']}.txt", "a") as f:
-                    f.write(f'{message}\n')
-            sleep_time = 5
-        time.sleep(sleep_time)
-
-
-def create_files_for_logs(day: int) -> None:
-    """
-    Функция, создающая папку log{day}/, в которой хранятся логи работы
-    вебсайта и ссылки на аутентификацию
+    stats = UptimeAggregator(retention=float('inf'))
+    events = read_day_events(events_dir, day) if shard is None else read_events(day_path(events_dir, day, shard))
+    for event in events:
+        stats.observe(event)
+    return stats
+
+
+def write_report_csv(table: dict, path: str) -> None:
+    """
+    Функция, записывающая таблицу отчета в .csv файл. Если установлен pandas, то файл пишет он, иначе
+    стандартный модуль csv в том же формате: в столбце, где есть дробные числа, целые числа тоже
+    записываются дробными, как их записывает pandas.
 
     Args:
-        day (int): День, для которого формируется отчет. То есть день 1, день 2 и т.п.
+        table (dict): Столбцы отчета, см. build_report_table
+        path (str): Путь до .csv файла
 
     Returns:
         None
     """
-    if not os.path.exists(f'logs{day}'):
-        os.mkdir(f'logs{day}')
-    if not os.path.exists(f'logs{day}/website'):
-        os.mkdir(f'logs{day}/website')
-    if not os.path.exists(f'logs{day}/mobile'):
-        os.mkdir(f'logs{day}/mobile')
-    for i in range(len(organizations)):
-        f = Path(f'logs{day}/website/errors_{organizations[i]["organisation_name"]}.txt')
-        f.touch(exist_ok=True)
-        f = open(f, "w+")
-        b = Path(f'logs{day}/website/total_time_errors_{organizations[i]["organisation_name"]}.txt')
-        b.touch(exist_ok=True)
-        b = open(b, "w+")
-        f = Path(f'logs{day}/mobile/errors_{organizations[i]["organisation_name"]}.txt')
-        f.touch(exist_ok=True)
-        f = open(f, "w+")
-        b = Path(f'logs{day}/mobile/total_time_errors_{organizations[i]["organisation_name"]}.txt')
-        b.touch(exist_ok=True)
-        b = open(b, "w+")
-
-
-def generate_report(day: int) -> None:
+    try:
+        import pandas as pd
+    except ImportError:
+        pd = None
+    if pd is not None:
+        pd.DataFrame(table).to_csv(path, index=False)
+        return
+    columns = []
+    for values in table.values():
+        if any(isinstance(value, float) for value in values):
+            values = [float(value) if isinstance(value, int) else value for value in values]
+        columns.append(values)
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file, lineterminator='\n')
+        writer.writerow(table.keys())
+        writer.writerows(zip(*columns))
+
+
+def generate_report(day: int, events_dir: str = 'events', stats: UptimeAggregator = None, start: float = None,
+                    end: float = None, telegram: tuple = None) -> str:
     """
     Функция, которая генерирует отчет и отправляет его в Telegram канал. Отчет формируется в формате .csv
-    таблицы. Содержит в себе по вертикали 10 строк, которые представляют отчетность работы сервиса кампании.
+    таблицы. Содержит в себе по вертикали по строке на каждую проверявшуюся за день организацию из файла целей.
     Столбцы имеют название: перечень организаций, uptime сайта, uptime мобильного приложения, время недоступности сайта,
     время недоступности мобильного приложения, суммарное время недоступности сервиса.
     Пояснение: uptime - результат деления времени непрерывной работы на время в сутках умноженное на 100 с точностью до
     2 знаков после запятой, например: 99,98%
     Пояснение:   время недоступности конкретного сервиса в формате – «Наименование сервиса – timestamp прекращения
     работы сервиса – timestamp восстановления работы сервиса – timestamp прекращения работы сервиса»
+    Отчет строится по накопительной статистике мониторинга за сутки с момента его запуска или за окно
+    [start, end], если оно задано. Если статистика не передана, то она восстанавливается из журнала событий дня.
 
     Args:
         day (int): День, для которого формируется отчет. То есть день 1, день 2 и т.п.
+        events_dir (str): Папка журнала событий
+        stats (UptimeAggregator): Накопительная статистика доступности
+        start (float): Начало окна отчета, секунды с начала эпохи, по умолчанию начало мониторинга
+        end (float): Конец окна отчета, секунды с начала эпохи, по умолчанию через сутки после start
+        telegram (tuple): telegram_token, chat_id и адрес Telegram Api, None - отчет в Telegram не отправляется
+
+    Returns:
+        str: Путь до отчета
+    """
+    if stats is None:
+        stats = load_stats_from_events(events_dir, day)
+    if start is None:
+        start = stats.started_at if stats.started_at is not None else time.time()
+    if end is None:
+        end = start + 86400
+    final_table = build_report_table(stats, TargetCatalog(events_dir), start, end, now=end)
+    path = f"report_{day}.csv"
+    write_report_csv(final_table, path)
+    if telegram is not None:
+        send_telegram_csv_document(path, *telegram)
+    return path
+
+
+def parse_rollover_time(value) -> datetime.time:
+    """
+    Функция, разбирающая время смены дня из config.yml в формате ЧЧ:ММ. YAML читает незакавыченное
+    значение вида 3:30 как число минут, поэтому число тоже принимается.
+
+    Args:
+        value: Время смены дня, строка ЧЧ:ММ или количество минут после полуночи
+
+    Returns:
+        datetime.time: Время смены дня
+    """
+    if isinstance(value, int):
+        hours, minutes = divmod(value, 60)
+        return datetime.time(hours, minutes)
+    return datetime.datetime.strptime(str(value), '%H:%M').time()
+
+
+def monitoring_day(timestamp: float, rollover: datetime.time) -> int:
+    """
+    Функция, возвращающая день мониторинга в режиме daemon в виде числа ГГГГММДД. День начинается
+    в локальное время rollover и называется по дате своего начала.
+
+    Args:
+        timestamp (float): Время, секунды с начала эпохи
+        rollover (datetime.time): Время смены дня
+
+    Returns:
+        int: День мониторинга
+    """
+    moment = datetime.datetime.fromtimestamp(timestamp)
+    date = moment.date() if moment.time() >= rollover else moment.date() - datetime.timedelta(days=1)
+    return int(date.strftime('%Y%m%d'))
+
+
+def day_bounds(day: int, rollover: datetime.time) -> [float, float]:
+    """
+    Функция, возвращающая начало и конец дня мониторинга в режиме daemon.
+
+    Args:
+        day (int): День мониторинга, см. monitoring_day
+        rollover (datetime.time): Время смены дня
+
+    Returns:
+        [float, float]: Начало и конец дня, секунды с начала эпохи
+    """
+    date = datetime.datetime.strptime(str(day), '%Y%m%d').date()
+    return (datetime.datetime.combine(date, rollover).timestamp(),
+            datetime.datetime.combine(date + datetime.timedelta(days=1), rollover).timestamp())
+
+
+def create_engine(settings: dict, shard_organizations: list, day: int, notify, **options) -> 'ProbeEngine':
+    """
+    Функция, создающая движок мониторинга с настройками из config.yml.
+
+    Args:
+        settings (dict): Настройки мониторинга из config.yml
+        shard_organizations (list): Организации шарда, None - все организации из файла целей
+        day (int): День, для которого формируется отчет
+        notify: Неблокирующая функция отправки уведомления
+        **options: Остальные параметры ProbeEngine, например duration, shard и checkpoint_path
+
+    Returns:
+        ProbeEngine: Движок мониторинга
+    """
+    from probe_engine import ProbeEngine
+    from target_registry import load_targets
+
+    if shard_organizations is None:
+        shard_organizations = load_targets(settings['targets_path'])
+    return ProbeEngine(shard_organizations, day, notify,
+                       concurrency=settings['max_concurrent_probes'], events_dir=settings['events_dir'],
+                       probe_method=settings['probe_method'], limit_per_host=settings['max_connections_per_host'],
+                       keepalive_timeout=settings['keepalive_timeout'],
+                       max_failing_interval=settings['max_failing_interval'], backoff=settings['failing_backoff'],
+                       jitter=settings['probe_jitter'], metrics_port=settings['metrics_port'],
+                       dns_ttl=settings['dns_ttl'], dns_negative_ttl=settings['dns_negative_ttl'],
+                       dns_prefetch=settings['dns_prefetch'], confirmations=settings['outage_confirmations'],
+                       breaker_threshold=settings['breaker_threshold'], breaker_cooldown=settings['breaker_cooldown'],
+                       breaker_max_cooldown=settings['breaker_max_cooldown'], **options)
+
+
+def hold_reload_signal() -> None:
+    """
+    Функция, которую процесс шарда вызывает первой. Пока движок не готов (например, статистика дня еще
+    восстанавливается из журнала), SIGHUP от координатора только запоминается, а не завершает процесс,
+    как по умолчанию. Запомненное изменение файла целей применяется в watch_target_file.
 
     Returns:
         None
     """
-    organisation_names = []
-    for organisation in organizations:
-        organisation_names.append(organisation['organisation_name'])
+    signal.signal(signal.SIGHUP, lambda *_: _reload_requested.set())
 
-    uptime_website, total_website_time_errors = [], [0] * 10
-    for i in range(len(organizations)):
-        if os.path.getsize(f'logs{day}/website/total_time_errors_{organizations[i]["organisation_name"]}.txt') == 0:
-            uptime_website.append(100)
-        else:
-            with open(f'logs{day}/website/total_time_errors_{organizations[i]["organisation_name"]}.txt', 'r') as f:
-                reader = csv.reader(f)
-                total_time_errors = 0
-                for row in reader:
-                    total_time_errors += int(row[0])
-                total_website_time_errors[i] = total_time_errors
-                uptime_website.append(float("{:.2f}".format((86400 - total_time_errors) / 86400 * 100)))
-
-    uptime_mobile, total_mobile_time_errors = [], [0] * 10
-    for i in range(len(organizations)):
-        if os.path.getsize(f'logs{day}/mobile/total_time_errors_{organizations[i]["organisation_name"]}.txt') == 0:
-            uptime_mobile.append(100)
-        else:
-            with open(f'logs{day}/mobile/total_time_errors_{organizations[i]["organisation_name"]}.txt', 'r') as f:
-                reader = csv.reader(f)
-                total_time_errors = 0
-                for row in reader:
-                    total_time_errors += int(row[0])
-                total_mobile_time_errors[i] = total_time_errors
-                uptime_mobile.append(float("{:.2f}".format((86400 - total_time_errors) / 86400 * 100)))
-
-    errors_mobile_info = ['-'] * 10
-    for i in range(len(organizations)):
-        if os.path.getsize(f'logs{day}/mobile/errors_{organizations[i]["organisation_name"]}.txt'):
-            with open(f'logs{day}/mobile/errors_{organizations[i]["organisation_name"]}.txt', 'r') as f:
-                starting_string = f'{organizations[i]["service_name"]} - '
-                reader = csv.reader(f)
-                counter = 0
-                for row in reader:
-                    counter += 1
-                    if counter % 2 == 1:
-                        starting_string += f"{row[0].split(' - ')[3]} прекращения работы сервиса - "
-                    else:
-                        starting_string += f"{row[0].split(' - ')[3]} восстановления работы сервиса - "
-                starting_string = starting_string.split(' - ')[:-1]
-                starting_string = ' - '.join(starting_string)
-                errors_mobile_info[i] = starting_string
-
-    errors_website_info = ['-'] * 10
-    for i in range(len(organizations)):
-        if os.path.getsize(f'logs{day}/website/errors_{organizations[i]["organisation_name"]}.txt'):
-            with open(f'logs{day}/website/errors_{organizations[i]["organisation_name"]}.txt', 'r') as f:
-                starting_string = f'{organizations[i]["service_name"]} - '
-                reader = csv.reader(f)
-                counter = 0
-                for row in reader:
-                    counter += 1
-                    if counter % 2 == 1:
-                        starting_string += f"{row[0].split(' - ')[3]} прекращения работы сервиса - "
-                    else:
-                        starting_string += f"{row[0].split(' - ')[3]} восстановления работы сервиса - "
-                starting_string = starting_string.split(' - ')[:-1]
-                starting_string = ' - '.join(starting_string)
-                errors_website_info[i] = starting_string
-
-    total_mobile_and_website_time_errors = []
-    for i in range(len(organizations)):
-        total_mobile_and_website_time_errors.append(total_website_time_errors[i] + total_mobile_time_errors[i])
-
-    final_table = {'Перечень организаций': organisation_names,
-                   'Uptime сайта': uptime_website,
-                   'Uptime мобильного приложения': uptime_mobile,
-                   'Время недоступности сайта': errors_website_info,
-                   'Время недоступности мобильного приложения': errors_mobile_info,
-                   'Суммарное время недоступности сервиса': total_mobile_and_website_time_errors}
-    df = pd.DataFrame(final_table)
-    df.to_csv(f"report_{day}.csv", index=False)
-    send_telegram_csv_document(f"report_{day}.csv")
-
-
-def main() -> None:
-    """
-    Основная функция, которая запускает всю программу. Она создает 20 потоков, которые параллельно
-    ведут в течение 24 часов мониторинг и отправляют уведомления в Telegram. Программа ждет, когда
-    закончатся все потоки, чтобы сформировать ежедневный отчет.
+
+def watch_target_file(engine: 'ProbeEngine', settings: dict, shard: int = None):
+    """
+    Функция, включающая применение изменений файла целей без перезапуска мониторинга. В одном процессе
+    файл опрашивается раз в targets_reload_interval секунд. Процесс шарда файл не опрашивает, а перечитывает
+    его по сигналу SIGHUP от координатора и берет из него только свои ссылки. Если сигнал пришел до готовности
+    движка, то файл перечитывается сразу.
+
+    Args:
+        engine (ProbeEngine): Движок мониторинга
+        settings (dict): Настройки мониторинга из config.yml
+        shard (int): Номер шарда или None при мониторинге в одном процессе
+
+    Returns:
+        Задача опроса файла целей или None, если она не нужна
+    """
+    import yaml
+
+    from sharding import partition_organizations
+    from target_registry import load_targets, watch_targets
+
+    path = settings['targets_path']
+    if shard is None:
+        if not settings['targets_reload_interval']:
+            return None
+        return asyncio.create_task(watch_targets(path, engine.update_targets, settings['targets_reload_interval']))
+
+    def reload() -> None:
+        try:
+            organizations = load_targets(path)
+            engine.update_targets(partition_organizations(organizations, settings['workers'])[shard])
+        except (OSError, ValueError, yaml.YAMLError) as e:
+            logging.error(f"Файл целей {path} не применен: {e}")
+        except Exception:
+            logging.exception(f"Файл целей {path} не применен")
+
+    asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, reload)
+    if _reload_requested.is_set():
+        _reload_requested.clear()
+        reload()
+    return None
+
+
+async def run_monitoring(day: int, settings: dict, shard_organizations: list = None, shard: int = None,
+                         duration: float = 86400) -> 'ProbeEngine':
+    """
+    Функция, которая в одном event loop запускает фоновую отправку уведомлений в Telegram
+    и асинхронный движок мониторинга, а после окончания мониторинга дожидается отправки
+    оставшихся уведомлений.
+
+    Args:
+        day (int): День, для которого формируется отчет. То есть день 1, день 2 и т.п.
+        settings (dict): Настройки мониторинга из config.yml
+        shard_organizations (list): Организации шарда, по умолчанию все организации из файла целей
+        shard (int): Номер шарда или None при мониторинге в одном процессе
+        duration (float): Длительность мониторинга в секундах
+
+    Returns:
+        ProbeEngine: Завершивший работу движок мониторинга с накопленной статистикой
+    """
+    from notifier import TelegramNotifier
+
+    notifier = TelegramNotifier(*telegram_credentials(settings),
+                                batch_window=settings['notification_batch_window'],
+                                rate=settings['notifications_per_minute'] / 60)
+    notifier.start()
+    engine = create_engine(settings, shard_organizations, day, notifier.notify, duration=duration, shard=shard)
+    watcher = watch_target_file(engine, settings, shard)
+    try:
+        await engine.run()
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        await notifier.close(timeout=10)
+    return engine
+
+
+def monitoring_worker(day: int, settings: dict, shard_organizations: list, shard: int, duration: float) -> None:
+    """
+    Точка входа процесса шарда: мониторинг организаций шарда со своим журналом событий.
+
+    Args:
+        day (int): День, для которого формируется отчет. То есть день 1, день 2 и т.п.
+        settings (dict): Настройки мониторинга шарда
+        shard_organizations (list): Организации шарда
+        shard (int): Номер шарда
+        duration (float): Длительность мониторинга в секундах
+
+    Returns:
+        None
+    """
+    hold_reload_signal()
+    asyncio.run(run_monitoring(day, settings, shard_organizations, shard, duration))
+
+
+async def run_daemon(settings: dict, shard_organizations: list = None, shard: int = None,
+                     reports: bool = True) -> None:
+    """
+    Функция, которая ведет мониторинг круглосуточно, пока процесс не получит SIGTERM или SIGINT.
+    В локальное время rollover_time мониторинг переключается на новый день без остановки проверок,
+    а отчет за прошедший день строится и отправляется в фоновом потоке. Открытые сбои периодически
+    сохраняются на диск, поэтому после перезапуска статистика дня восстанавливается из журнала,
+    а открытые сбои продолжаются без разрыва.
+
+    Args:
+        settings (dict): Настройки мониторинга из config.yml
+        shard_organizations (list): Организации шарда, по умолчанию все организации из файла целей
+        shard (int): Номер шарда или None при мониторинге в одном процессе
+        reports (bool): Строить ли отчет за прошедший день, при мониторинге в нескольких процессах
+                        отчет строит координатор
+
+    Returns:
+        None
+    """
+    from notifier import TelegramNotifier
+
+    loop = asyncio.get_running_loop()
+    rollover = parse_rollover_time(settings['rollover_time'])
+    events_dir = settings['events_dir']
+    day = monitoring_day(time.time(), rollover)
+    notifier = TelegramNotifier(*telegram_credentials(settings),
+                                batch_window=settings['notification_batch_window'],
+                                rate=settings['notifications_per_minute'] / 60)
+    notifier.start()
+    engine = create_engine(settings, shard_organizations, day, notifier.notify, duration=math.inf, shard=shard,
+                           checkpoint_path=checkpoint_path(events_dir, shard))
+    engine.stats = load_stats_from_events(events_dir, day, shard)
+    for signal_number in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signal_number, engine.stop)
+    watcher = watch_target_file(engine, settings, shard)
+    monitor = asyncio.create_task(engine.run())
+    pending_reports = []
+    try:
+        while not monitor.done():
+            day_end = day_bounds(day, rollover)[1]
+            # Ждем не дольше минуты, чтобы перевод системных часов не сдвинул смену дня надолго.
+            await asyncio.wait({monitor}, timeout=min(60.0, max(0.0, day_end - time.time())))
+            if monitor.done() or time.time() < day_end:
+                continue
+            next_day = monitoring_day(day_end, rollover)
+            previous = engine.rollover(next_day, day_end)
+            if reports:
+                pending_reports.append(loop.run_in_executor(None, generate_report, day, events_dir, previous,
+                                                            *day_bounds(day, rollover),
+                                                            telegram_credentials(settings)))
+            day = next_day
+        await monitor
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        await notifier.close(timeout=10)
+        await asyncio.gather(*pending_reports, return_exceptions=True)
+
+
+def daemon_worker(settings: dict, shard_organizations: list, shard: int) -> None:
+    """
+    Точка входа процесса шарда в режиме daemon.
+
+    Args:
+        settings (dict): Настройки мониторинга шарда
+        shard_organizations (list): Организации шарда
+        shard (int): Номер шарда
+
+    Returns:
+        None
+    """
+    hold_reload_signal()
+    asyncio.run(run_daemon(settings, shard_organizations, shard, reports=False))
+
+
+def run_sharded_monitoring(day: int, settings: dict, duration: float = 86400) -> None:
+    """
+    Функция-координатор мониторинга в нескольких процессах. Ссылки распределяются по settings['workers']
+    шардам консистентным хешированием по хосту (см. sharding.py), и каждый шард проверяется в отдельном
+    процессе со своим журналом событий. Лимит уведомлений делится между шардами поровну, а сервер метрик
+    шарда слушает порт metrics_port + номер шарда. Если процесс шарда упал, то координатор перезапускает
+    его на оставшееся время, а остальные шарды продолжают работу. Координатор возвращается, когда все
+    шарды закончили мониторинг, после чего отчет строится по журналам всех шардов.
+    В режиме daemon шарды работают круглосуточно и сами переключаются на новый день, а координатор после
+    смены дня строит в фоновом потоке отчет за прошедший день по журналам всех шардов. По SIGTERM или SIGINT
+    координатор останавливает шарды и возвращается.
+    Файл целей опрашивает только координатор. При его изменении координатор заводит id новых организаций,
+    запускает шарды, которым достались первые ссылки, и отправляет работающим шардам SIGHUP, чтобы они
+    перечитали файл.
+
+    Args:
+        day (int): День, для которого формируется отчет. То есть день 1, день 2 и т.п. В режиме daemon не используется
+        settings (dict): Настройки мониторинга из config.yml
+        duration (float): Длительность мониторинга в секундах. В режиме daemon не используется
 
     Returns:
         None
     """
-    day = 2
-    create_files_for_logs(day)
-    threads = []
+    import yaml
+
+    from sharding import partition_organizations
+    from target_registry import file_signature, load_targets
+
+    workers = settings['workers']
+    targets_path = settings['targets_path']
+    signature = file_signature(targets_path)
+    organizations = load_targets(targets_path)
+    # Id организаций заводятся до запуска шардов, чтобы процессы шардов не писали справочник одновременно.
+    catalog = TargetCatalog(settings['events_dir'])
     for organisation in organizations:
-        a = threading.Thread(target=check_organisation_service_link, args=(organisation, day, time.time()))
-        b = threading.Thread(target=check_organisation_mobile_service_link, args=(organisation, day, time.time()))
-        threads.append(a)
-        threads.append(b)
-        a.start()
-        b.start()
-    for t in threads:
-        t.join()
-    generate_report(day)
+        catalog.target_id(organisation)
+    shards = partition_organizations(organizations, workers)
+    reload_interval = settings['targets_reload_interval']
+    reload_at = time.monotonic() + reload_interval
+    daemon = settings['daemon']
+    deadline = math.inf if daemon else time.monotonic() + duration
+    rollover = parse_rollover_time(settings['rollover_time'])
+    report_day = monitoring_day(time.time(), rollover)
+    processes = {}
+    stopping = threading.Event()
+    if daemon:
+        for signal_number in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signal_number, lambda *_: stopping.set())
+
+    def start_worker(shard: int) -> None:
+        shard_settings = {**settings, 'notifications_per_minute': settings['notifications_per_minute'] / workers,
+                          'metrics_port': settings['metrics_port'] + shard if settings['metrics_port'] else 0}
+        if daemon:
+            target, args = daemon_worker, (shard_settings, shards[shard], shard)
+        else:
+            target, args = monitoring_worker, (day, shard_settings, shards[shard], shard, deadline - time.monotonic())
+        process = multiprocessing.Process(target=target, name=f'shard-{shard}', daemon=True, args=args)
+        process.start()
+        processes[shard] = process
+        logging.info(f"Шард {shard} запущен: {len(shards[shard])} организаций, pid {process.pid}")
+
+    for shard in range(workers):
+        if shards[shard]:
+            start_worker(shard)
+    while processes:
+        stopping.wait(1)
+        if stopping.is_set():
+            for process in processes.values():
+                process.terminate()
+            for process in processes.values():
+                process.join()
+            break
+        day_start, day_end = day_bounds(report_day, rollover)
+        # Шарды переключаются на новый день сами, поэтому отчет строится с небольшой задержкой после смены дня.
+        if daemon and time.time() >= day_end + 5:
+            threading.Thread(target=generate_report, args=(report_day, settings['events_dir'], None, day_start,
+                                                           day_end, telegram_credentials(settings))).start()
+            report_day = monitoring_day(day_end, rollover)
+        if reload_interval and time.monotonic() >= reload_at:
+            reload_at = time.monotonic() + reload_interval
+            current = file_signature(targets_path)
+            if current is not None and current != signature:
+                signature = current
+                try:
+                    organizations = load_targets(targets_path)
+                except (OSError, ValueError, yaml.YAMLError) as e:
+                    logging.error(f"Файл целей {targets_path} не применен: {e}")
+                else:
+                    for organisation in organizations:
+                        catalog.target_id(organisation)
+                    shards[:] = partition_organizations(organizations, workers)
+                    for shard in range(workers):
+                        if shard in processes and processes[shard].is_alive():
+                            os.kill(processes[shard].pid, signal.SIGHUP)
+                        elif shards[shard] and shard not in processes:
+                            start_worker(shard)
+        for shard, process in list(processes.items()):
+            if process.is_alive():
+                continue
+            del processes[shard]
+            if daemon or (process.exitcode != 0 and deadline - time.monotonic() > 1):
+                logging.error(f"Шард {shard} завершился с кодом {process.exitcode}, перезапуск")
+                start_worker(shard)
+
+
+async def check_once(organizations: list, timeout: float = 2, method: str = 'range') -> list:
+    """
+    Функция, которая один раз одновременно проверяет все ссылки организаций без журнала событий,
+    статистики и уведомлений. Одинаковые ссылки проверяются одним запросом.
+
+    Args:
+        organizations (list): Список организаций из файла целей
+        timeout (float): Таймаут запроса в секундах
+        method (str): Способ проверки: get, head или range, см. http_pool.fetch_status
+
+    Returns:
+        list: Кортежи (организация, канал, ссылка, HTTP код ответа, время ответа в секундах, ошибка или None)
+    """
+    import aiohttp
+
+    from http_pool import create_probe_session, fetch_status
+    from probe_engine import CHANNELS
+
+    targets = [(organisation, channel, organisation[link_key]) for organisation in organizations
+               for channel, link_key in CHANNELS.items() if organisation.get(link_key)]
+    loop = asyncio.get_running_loop()
+
+    async def probe(link: str, link_timeout: float):
+        started = loop.time()
+        try:
+            status = await fetch_status(session, link, method, timeout=link_timeout)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return 0, loop.time() - started, str(e) or type(e).__name__
+        return status, loop.time() - started, None
+
+    timeouts = {}
+    for organisation, _, link in targets:
+        timeouts[link] = max(timeouts.get(link, 0), organisation.get('timeout') or timeout)
+    async with create_probe_session(timeout, limit=len(timeouts) or 1, limit_per_host=4,
+                                    keepalive_timeout=0) as session:
+        results = dict(zip(timeouts, await asyncio.gather(*(probe(link, link_timeout)
+                                                             for link, link_timeout in timeouts.items()))))
+    return [(organisation['organisation_name'], channel, link, *results[link])
+            for organisation, channel, link in targets]
+
+
+def run_check_once(targets_path: str, timeout: float, method: str) -> int:
+    """
+    Функция команды check-once: проверяет все ссылки файла целей один раз и выводит таблицу результатов.
+
+    Args:
+        targets_path (str): Путь до файла целей
+        timeout (float): Таймаут запроса в секундах
+        method (str): Способ проверки: get, head или range
+
+    Returns:
+        int: Код выхода: 0, если все ссылки ответили, иначе 1
+    """
+    from target_registry import load_targets
+
+    results = asyncio.run(check_once(load_targets(targets_path), timeout, method))
+    for name, channel, link, status, latency, error in results:
+        state = 'OK' if error is None else f'ошибка: {error}'
+        print(f"{name}\t{channel}\t{link}\t{status}\t{latency * 1000:.0f} мс\t{state}")
+    failed = sum(error is not None for *_, error in results)
+    print(f"Проверено ссылок: {len(results)}, недоступно: {failed}")
+    return 1 if failed else 0
+
+
+def run_monitor(day: int, config_path: str) -> None:
+    """
+    Функция команды monitor. Она запускает асинхронный движок, который в одном event loop в течение
+    24 часов ведет мониторинг всех ссылок и отправляет уведомления в Telegram.
+    Если в config.yml указано несколько workers, то мониторинг ведут несколько процессов-шардов.
+    Программа ждет, когда закончится мониторинг, чтобы сформировать ежедневный отчет.
+    Если в config.yml включен daemon, то мониторинг работает круглосуточно, а отчеты формируются
+    после каждой смены дня, см. run_daemon.
+
+    Args:
+        day (int): День, для которого формируется отчет. То есть день 1, день 2 и т.п.
+        config_path (str): Путь до config.yml
+
+    Returns:
+        None
+    """
+    settings = get_monitor_settings_from_config(config_path)
+    if settings['workers'] > 1:
+        run_sharded_monitoring(day, settings)
+        if not settings['daemon']:
+            generate_report(day, settings['events_dir'], telegram=telegram_credentials(settings))
+        return
+    if settings['daemon']:
+        asyncio.run(run_daemon(settings))
+        return
+    engine = asyncio.run(run_monitoring(day, settings))
+    generate_report(day, settings['events_dir'], engine.stats, telegram=telegram_credentials(settings))
+
+
+def run_report(day: int, config_path: str, events_dir: str = None, send: bool = True) -> int:
+    """
+    Функция команды report: строит отчет за день по журналу событий без запуска мониторинга.
+    config.yml читается, только если из него нужны папка журнала или данные Telegram бота. Если файла
+    нет, то отчет только сохраняется в .csv. Если за день в журнале нет событий, то отчет не создается,
+    чтобы не перезаписать прежний отчет пустым.
+
+    Args:
+        day (int): День, для которого формируется отчет
+        config_path (str): Путь до config.yml
+        events_dir (str): Папка журнала событий, по умолчанию events_dir из config.yml или events
+        send (bool): Отправлять ли отчет в Telegram
+
+    Returns:
+        int: Код выхода: 0, если отчет сформирован, иначе 1
+    """
+    settings = None
+    if (send or events_dir is None) and os.path.exists(config_path):
+        settings = get_monitor_settings_from_config(config_path)
+    if events_dir is None:
+        events_dir = settings['events_dir'] if settings is not None else 'events'
+    stats = load_stats_from_events(events_dir, day)
+    if not stats.series:
+        logging.error(f"В журнале {events_dir} нет событий за день {day}, отчет не сформирован")
+        return 1
+    telegram = telegram_credentials(settings) if send and settings is not None else None
+    if send and telegram is None:
+        logging.warning(f"{config_path} не найден, отчет не будет отправлен в Telegram")
+    path = generate_report(day, events_dir, stats, telegram=telegram)
+    logging.info(f"Отчет сохранен в {path}")
+    return 0
+
+
+def parse_args(argv: list) -> argparse.Namespace:
+    """
+    Функция, разбирающая аргументы командной строки. Без команды, в том числе с параметрами monitor
+    (например, --day 3), запускается monitor, как раньше.
+
+    Args:
+        argv (list): Аргументы командной строки без имени программы
+
+    Returns:
+        argparse.Namespace: Команда и ее параметры
+    """
+    parser = argparse.ArgumentParser(description='Мониторинг доступности сервисов организаций')
+    commands = parser.add_subparsers(dest='command')
+    monitor = commands.add_parser('monitor', help='Мониторинг ссылок с уведомлениями и ежедневным отчетом')
+    monitor.add_argument('--config', default=path_to_config, help='Путь до config.yml')
+    monitor.add_argument('--day', type=int, default=2, help='День, для которого формируется отчет')
+    report = commands.add_parser('report', help='Отчет за день по журналу событий без мониторинга')
+    report.add_argument('--day', type=int, required=True, help='День отчета, например 2 или 20240101')
+    report.add_argument('--config', default=path_to_config, help='Путь до config.yml')
+    report.add_argument('--events-dir', help='Папка журнала событий, по умолчанию events_dir из config.yml')
+    report.add_argument('--no-send', action='store_true', help='Не отправлять отчет в Telegram')
+    check = commands.add_parser('check-once', help='Однократная проверка всех ссылок файла целей')
+    check.add_argument('--targets', default='targets.yml', help='Путь до файла целей')
+    check.add_argument('--timeout', type=float, default=2, help='Таймаут запроса в секундах')
+    check.add_argument('--method', choices=('get', 'head', 'range'), default='range', help='Способ проверки')
+    # Аргументы без команды (например, --day 3) относятся к monitor.
+    if not argv or (argv[0].startswith('-') and argv[0] not in ('-h', '--help')):
+        argv = ['monitor', *argv]
+    return parser.parse_args(argv)
+
+
+def main(argv: list = None) -> int:
+    """
+    Основная функция, которая запускает всю программу. Команды:
+    monitor - мониторинг ссылок, см. run_monitor (запускается и без команды);
+    report --day N - отчет за день по журналу событий, см. run_report;
+    check-once - однократная проверка всех ссылок, см. run_check_once.
+
+    Args:
+        argv (list): Аргументы командной строки, по умолчанию sys.argv[1:]
+
+    Returns:
+        int: Код выхода программы
+    """
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    logging.basicConfig(level=logging.INFO)
+    if args.command == 'report':
+        return run_report(args.day, args.config, args.events_dir, send=not args.no_send)
+    elif args.command == 'check-once':
+        return run_check_once(args.targets, args.timeout, args.method)
+    else:
+        run_monitor(args.day, args.config)
+    return 0
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
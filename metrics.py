@@ -0,0 +1,226 @@
+import math
+from array import array
+
+
+class LatencyHistogram:
+    """
+    Гистограмма времени ответа с фиксированным объемом памяти в духе HDR Histogram. Диапазон от
+    lowest до highest секунд разбит на степени двойки, а каждая степень двойки - на sub_buckets равных
+    корзин, поэтому относительная погрешность перцентилей не больше 1 / sub_buckets независимо от количества
+    записанных значений. Значения меньше lowest попадают в первую корзину, больше highest - в последнюю.
+
+    Args:
+        lowest (float): Нижняя граница диапазона в секундах
+        highest (float): Верхняя граница диапазона в секундах
+        sub_buckets (int): Количество корзин на одну степень двойки
+    """
+
+    def __init__(self, lowest: float = 0.001, highest: float = 64.0, sub_buckets: int = 16):
+        self.lowest = lowest
+        self.sub_buckets = sub_buckets
+        self.magnitudes = max(1, math.ceil(math.log2(highest / lowest)))
+        self.counts = array('I', [0]) * (self.magnitudes * sub_buckets)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def _index(self, value: float) -> int:
+        if value <= self.lowest:
+            return 0
+        scaled = value / self.lowest
+        magnitude = min(int(math.log2(scaled)), self.magnitudes - 1)
+        sub_bucket = min(int((scaled / 2 ** magnitude - 1) * self.sub_buckets), self.sub_buckets - 1)
+        return magnitude * self.sub_buckets + sub_bucket
+
+    def _upper_bound(self, index: int) -> float:
+        magnitude, sub_bucket = divmod(index, self.sub_buckets)
+        return self.lowest * 2 ** magnitude * (1 + (sub_bucket + 1) / self.sub_buckets)
+
+    def record(self, value: float) -> None:
+        """
+        Функция, записывающая одно значение в гистограмму.
+
+        Args:
+            value (float): Время в секундах
+
+        Returns:
+            None
+        """
+        self.counts[self._index(value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, q: float) -> float:
+        """
+        Функция, возвращающая перцентиль записанных значений, например q=99 для p99.
+
+        Args:
+            q (float): Перцентиль от 0 до 100
+
+        Returns:
+            float: Верхняя граница корзины, в которую попадает перцентиль, в секундах, или 0, если значений нет
+        """
+        if self.count == 0:
+            return 0.0
+        rank = max(1, math.ceil(q / 100 * self.count))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self._upper_bound(index), self.max)
+        return self.max
+
+    def mean(self) -> float:
+        """
+        Функция, возвращающая среднее записанных значений.
+
+        Returns:
+            float: Среднее в секундах, или 0, если значений нет
+        """
+        return self.total / self.count if self.count else 0.0
+
+    def percentiles(self, qs: list) -> list:
+        """
+        Функция, возвращающая несколько перцентилей за один проход по корзинам.
+
+        Args:
+            qs (list): Перцентили от 0 до 100 в порядке возрастания
+
+        Returns:
+            list: Значения перцентилей в секундах
+        """
+        if self.count == 0:
+            return [0.0] * len(qs)
+        ranks = [max(1, math.ceil(q / 100 * self.count)) for q in qs]
+        result, seen, position = [], 0, 0
+        for index, count in enumerate(self.counts):
+            if not count:
+                continue
+            seen += count
+            while position < len(ranks) and seen >= ranks[position]:
+                result.append(min(self._upper_bound(index), self.max))
+                position += 1
+            if position == len(ranks):
+                break
+        return result + [self.max] * (len(ranks) - len(result))
+
+
+# Фазы проверки, для которых копятся гистограммы: DNS, подключение (TCP и TLS), время до первого байта
+# ответа и полное время проверки.
+PHASES = ('dns', 'connect', 'ttfb', 'total')
+QUANTILES = (50, 95, 99)
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: dict) -> str:
+    return ','.join(f'{key}="{_escape_label(value)}"' for key, value in labels.items())
+
+
+class ProbeMetrics:
+    """
+    Метрики проверок: гистограммы времени фаз PHASES для каждой ссылки и счетчики проверок
+    по каналам и результату. Метрики выгружаются в текстовом формате Prometheus.
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self.labels = {}
+        self.counters = {}
+
+    def count(self, channel: str, success: bool) -> None:
+        """
+        Функция, учитывающая один выполненный запрос в счетчике проверок. Запрос к ссылке, которая есть
+        у нескольких организаций, учитывается один раз.
+
+        Args:
+            channel (str): Канал проверки
+            success (bool): Успешна ли проверка
+
+        Returns:
+            None
+        """
+        counter_key = (channel, 'success' if success else 'failure')
+        self.counters[counter_key] = self.counters.get(counter_key, 0) + 1
+
+    def observe(self, key: str, labels: dict, success: bool, timings: dict) -> None:
+        """
+        Функция, учитывающая время фаз одной проверки в гистограммах ссылки.
+
+        Args:
+            key (str): Ключ ссылки
+            labels (dict): Метки ссылки, например организация и канал
+            success (bool): Успешна ли проверка
+            timings (dict): Время фаз проверки в секундах, фазы без времени пропускаются
+
+        Returns:
+            None
+        """
+        if not success:
+            return
+        histograms = self.histograms.get(key)
+        if histograms is None:
+            histograms = self.histograms[key] = {phase: LatencyHistogram(highest=16.0) for phase in PHASES}
+            self.labels[key] = labels
+        for phase in PHASES:
+            if phase in timings:
+                histograms[phase].record(timings[phase])
+
+    def render(self, gauges: dict, counters: dict = None) -> str:
+        """
+        Функция, выгружающая метрики в текстовом формате Prometheus.
+
+        Args:
+            gauges (dict): Дополнительные метрики вида {имя: значение}, например пропускная способность
+            counters (dict): Дополнительные монотонно растущие счетчики вида {имя: значение}
+
+        Returns:
+            str: Метрики в текстовом формате Prometheus
+        """
+        lines = ['# HELP probe_latency_seconds Время фаз проверки ссылки',
+                 '# TYPE probe_latency_seconds summary']
+        for key, histograms in self.histograms.items():
+            for phase, histogram in histograms.items():
+                labels = _format_labels({**self.labels[key], 'phase': phase})
+                for quantile, value in zip(QUANTILES, histogram.percentiles(QUANTILES)):
+                    lines.append(f'probe_latency_seconds{{{labels},quantile="{quantile / 100}"}} {value:.6f}')
+                lines.append(f'probe_latency_seconds_sum{{{labels}}} {histogram.total:.6f}')
+                lines.append(f'probe_latency_seconds_count{{{labels}}} {histogram.count}')
+        lines += ['# HELP probes_total Количество проверок по каналу и результату',
+                  '# TYPE probes_total counter']
+        for (channel, result), count in sorted(self.counters.items()):
+            lines.append(f'probes_total{{{_format_labels({"channel": channel, "result": result})}}} {count}')
+        for name, value in (counters or {}).items():
+            lines += [f'# TYPE {name} counter', f'{name} {value}']
+        for name, value in gauges.items():
+            lines += [f'# TYPE {name} gauge', f'{name} {value}']
+        return '\n'.join(lines) + '\n'
+
+
+async def start_metrics_server(render, host: str, port: int):
+    """
+    Функция, запускающая локальный HTTP сервер, который отдает метрики по адресу /metrics.
+
+    Args:
+        render: Функция без аргументов, возвращающая метрики в текстовом формате Prometheus
+        host (str): Адрес сервера
+        port (int): Порт сервера
+
+    Returns:
+        aiohttp.web.AppRunner: Запущенный сервер, остановить его можно через cleanup()
+    """
+    # aiohttp.web импортируется только при запуске сервера, чтобы модуль можно было импортировать без aiohttp.
+    from aiohttp import web
+
+    async def handle_metrics(request):
+        return web.Response(text=render(), content_type='text/plain', charset='utf-8')
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,233 @@
+import asyncio
+import logging
+
+import aiohttp
+
+# Максимальная длина одного сообщения Telegram.
+MAX_MESSAGE_LENGTH = 4096
+
+
+class TokenBucket:
+    """
+    Ограничитель частоты по алгоритму token bucket: токены пополняются со скоростью rate в секунду,
+    но их не больше capacity. Каждая отправка забирает один токен, а если токенов нет, то ждет пополнения.
+
+    Args:
+        rate (float): Скорость пополнения токенов в секунду
+        capacity (int): Максимальное количество токенов, то есть допустимая пачка отправок подряд
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = None
+
+    async def acquire(self) -> None:
+        """
+        Функция, забирающая один токен и при необходимости ждущая его пополнения.
+
+        Returns:
+            None
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            if self.updated_at is not None:
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def split_message(lines: list, limit: int = MAX_MESSAGE_LENGTH) -> list:
+    """
+    Функция, склеивающая строки уведомлений в сообщения не длиннее limit символов.
+    Строки не разрываются, если только одна строка сама не длиннее limit.
+
+    Args:
+        lines (list): Строки уведомлений
+        limit (int): Максимальная длина сообщения
+
+    Returns:
+        list: Сообщения
+    """
+    messages, current = [], ''
+    for line in lines:
+        while len(line) > limit:
+            if current:
+                messages.append(current)
+                current = ''
+            messages.append(line[:limit])
+            line = line[limit:]
+        if current and len(current) + 1 + len(line) > limit:
+            messages.append(current)
+            current = ''
+        current = f'{current}\n{line}' if current else line
+    if current:
+        messages.append(current)
+    return messages
+
+
+def retry_after_seconds(body, default: float) -> float:
+    """
+    Функция, достающая паузу retry_after из ответа 429 Telegram Api. Если ответ не в ожидаемом формате,
+    то возвращается пауза по умолчанию.
+
+    Args:
+        body: Разобранный JSON ответа
+        default (float): Пауза по умолчанию в секундах
+
+    Returns:
+        float: Пауза в секундах
+    """
+    parameters = body.get('parameters') if isinstance(body, dict) else None
+    retry_after = parameters.get('retry_after') if isinstance(parameters, dict) else None
+    if isinstance(retry_after, (int, float)) and not isinstance(retry_after, bool) and retry_after >= 0:
+        return retry_after
+    return default
+
+
+class TelegramNotifier:
+    """
+    Фоновая очередь уведомлений в Telegram, которая отделяет отправку уведомлений от проверок.
+    Метод notify только кладет уведомление в очередь и сразу возвращается, поэтому медленный или
+    недоступный Telegram Api не сбивает периодичность проверок. Уведомления, пришедшие в течение
+    batch_window секунд, склеиваются в одно сообщение. Отправка ограничена token bucket, при ответе
+    429 выдерживается пауза retry_after из ответа, а при ошибках сети и ответах 5xx отправка
+    повторяется с экспоненциально растущей паузой.
+
+    Args:
+        token (str): telegram_token бота
+        chat_id (str): chat_id чата
+        api_url (str): Адрес Telegram Api, для проверки можно указать локальный сервер-заглушку
+        batch_window (float): Сколько секунд копить уведомления перед отправкой одним сообщением
+        rate (float): Сколько сообщений в секунду можно отправлять в среднем
+        burst (int): Сколько сообщений можно отправить подряд без паузы
+        max_retries (int): Сколько раз повторять отправку сообщения после ошибки
+        retry_backoff (float): Пауза перед первым повтором в секундах, дальше она удваивается
+        max_queue (int): Максимальный размер очереди, уведомления сверх него отбрасываются
+    """
+
+    def __init__(self, token: str, chat_id: str, api_url: str = 'https://api.telegram.org', batch_window: float = 2.0,
+                 rate: float = 20 / 60, burst: int = 3, max_retries: int = 5, retry_backoff: float = 1.0,
+                 max_queue: int = 10000):
+        self.url = f"{api_url.rstrip('/')}/bot{token}/sendMessage"
+        self.chat_id = chat_id
+        self.batch_window = batch_window
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.sent = 0
+        self.dropped = 0
+        self.max_queue = max_queue
+        self._queue = None
+        self._task = None
+        self._session = None
+
+    def notify(self, message: str) -> None:
+        """
+        Функция, ставящая уведомление в очередь отправки. Не блокирует вызывающего.
+        Вызывать можно только после start.
+
+        Args:
+            message (str): Сообщение, которое будет отправлено в Telegram
+
+        Returns:
+            None
+        """
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logging.error(f"Очередь уведомлений переполнена, уведомление отброшено: {message}")
+
+    def start(self) -> None:
+        """
+        Функция, запускающая фоновую отправку уведомлений в текущем event loop.
+
+        Returns:
+            None
+        """
+        self._queue = asyncio.Queue(self.max_queue)
+        self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self, timeout: float = None) -> None:
+        """
+        Функция, дожидающаяся отправки всех уведомлений из очереди и останавливающая отправку.
+
+        Args:
+            timeout (float): Сколько секунд ждать отправки, None - ждать без ограничения
+
+        Returns:
+            None
+        """
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logging.error(f"Отправка уведомлений остановлена, в очереди осталось: {self._queue.qsize()}")
+        self._task.cancel()
+        await self._session.close()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            lines = [await self._queue.get()]
+            deadline = loop.time() + self.batch_window
+            while True:
+                try:
+                    lines.append(await asyncio.wait_for(self._queue.get(), max(0.0, deadline - loop.time())))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                for message in split_message(lines):
+                    await self.send(message)
+            except Exception:
+                # Фоновая отправка не должна останавливаться, иначе close будет ждать очередь бесконечно.
+                self.dropped += len(lines)
+                logging.exception("Непредвиденная ошибка отправки уведомлений")
+            finally:
+                for _ in lines:
+                    self._queue.task_done()
+
+    async def send(self, message: str) -> bool:
+        """
+        Функция, отправляющая одно сообщение с учетом ограничения частоты и повторами после ошибок.
+
+        Args:
+            message (str): Сообщение
+
+        Returns:
+            bool: True, если сообщение отправлено
+        """
+        delay = self.retry_backoff
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            try:
+                async with self._session.post(self.url, data={'chat_id': self.chat_id, 'text': message}) as response:
+                    if response.status == 200:
+                        self.sent += 1
+                        return True
+                    if response.status == 429:
+                        try:
+                            retry_after = retry_after_seconds(await response.json(content_type=None), delay)
+                        except ValueError:
+                            retry_after = delay
+                        logging.warning(f"Telegram Api ограничил частоту, повтор через {retry_after} с")
+                        await asyncio.sleep(retry_after)
+                        continue
+                    if response.status < 500:
+                        logging.error(f"Telegram Api отклонил сообщение: {response.status} {await response.text()}")
+                        break
+                    logging.warning(f"Telegram Api вернул {response.status}, повтор через {delay} с")
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                logging.warning(f"Ошибка отправки в Telegram: {str(e) or type(e).__name__}, повтор через {delay} с")
+            if attempt < self.max_retries:
+                await asyncio.sleep(delay)
+                delay *= 2
+        self.dropped += 1
+        logging.error(f"Уведомление не отправлено: {message}")
+        return False
@@ -0,0 +1,751 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from circuit_breaker import HALF_OPEN, OPEN, CircuitBreaker
+from dns_cache import CachingResolver, DNSResolutionError
+from event_store import (CHANNEL_IDS, ERROR_CONNECTION, ERROR_DNS, ERROR_NONE, ERROR_TIMEOUT, OUTAGE_CUTOFF,
+                         OUTAGE_END, OUTAGE_START, SAMPLE, Event, EventWriter, TargetCatalog, day_path, read_events)
+from http_pool import create_probe_session, fetch_status
+from metrics import ProbeMetrics, start_metrics_server
+from scheduler import ProbeScheduler, adaptive_interval, initial_delay
+from uptime_stats import UptimeAggregator
+
+# Каналы проверки: название канала и ключ ссылки в словаре организации.
+CHANNELS = {
+    'website': 'service_link',
+    'mobile': 'mobile_service_link',
+}
+
+# Настройки организации, которые можно задать в файле целей, см. target_registry.
+TARGET_OPTIONS = ('healthy_interval', 'failing_interval', 'timeout')
+
+
+def check_target_options(organisation: dict) -> None:
+    """
+    Функция, проверяющая, что интервалы проверки и таймаут организации, если они заданы, - положительные числа.
+
+    Args:
+        organisation (dict): Словарь организации
+
+    Returns:
+        None
+
+    Raises:
+        ValueError: Если значение настройки не является положительным числом
+    """
+    for option in TARGET_OPTIONS:
+        if option not in organisation:
+            continue
+        value = organisation[option]
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 < value < math.inf:
+            raise ValueError(f"у организации {organisation.get('organisation_name')} {option} должен быть "
+                             f"положительным числом, а не {value!r}")
+
+
+# Результат одной проверки: HTTP код ответа (0, если ответа нет), время начала запроса (секунды с начала эпохи
+# и по монотонным часам event loop), время ответа в секундах, ошибка запроса (None, если запрос успешен)
+# и время фаз запроса в секундах, см. metrics.PHASES.
+ProbeResult = namedtuple('ProbeResult', ['status', 'started', 'started_mono', 'latency', 'error', 'timings'])
+
+
+class ProbeTarget:
+    """
+    Состояние проверки одной ссылки организации: канал, ссылка, начало текущего сбоя
+    по часам и по монотонным часам event loop, класс ошибки, с которой начался сбой, количество ошибок подряд
+    и время первой из них.
+    Интервалы проверки и таймаут берутся из словаря организации, если они там заданы, см. target_registry.
+
+    Args:
+        organisation (dict): Словарь организации
+        channel (str): Канал проверки, website или mobile
+        target_id (int): Id организации в журнале событий
+    """
+
+    def __init__(self, organisation: dict, channel: str, target_id: int):
+        self.organisation = organisation
+        self.target_id = target_id
+        self.channel = channel
+        self.link = organisation[CHANNELS[channel]]
+        self.name = organisation['organisation_name']
+        self.key = f"{self.name}/{channel}"
+        self.outage_started = None
+        self.outage_started_mono = None
+        self.outage_error = ERROR_NONE
+        self.error_count = 0
+        self.failure_started = None
+        self.failure_started_mono = None
+        self.healthy_interval = organisation.get('healthy_interval')
+        self.failing_interval = organisation.get('failing_interval')
+        self.timeout = organisation.get('timeout')
+
+
+class ProbeEngine:
+    """
+    Асинхронный движок мониторинга. Вместо двух потоков на каждую организацию все проверки
+    веб-сайтов и мобильных ссылок выполняются как легковесные задачи в одном event loop.
+    Количество одновременно выполняющихся запросов ограничено глобальным семафором.
+    Сроки проверок хранит центральный планировщик ProbeScheduler: первые проверки равномерно
+    распределены по интервалу, к каждому интервалу добавляется случайный разброс, а пока ссылка
+    недоступна, интервал проверки увеличивается от failing_interval до max_failing_interval.
+    Ссылки с одинаковым адресом (например, у Сбербанка и Альфа-Банка) проверяются одним запросом, результат
+    которого учитывается для каждой из них. Проверки ссылок одного хоста проходят через общий автоматический
+    выключатель CircuitBreaker, который во время сбоя хоста заменяет проверки всех его ссылок одной пробной.
+    Сбой объявляется после confirmations ошибок подряд и начинается с первой из них.
+
+    Args:
+        organizations (list): Список словарей организаций, ссылки без значения не проверяются
+        day (int): День, для которого формируется отчет. То есть день 1, день 2 и т.п.
+        notify: Неблокирующая функция отправки уведомления, принимает текст сообщения, см. notifier.TelegramNotifier
+        concurrency (int): Максимальное количество одновременно выполняющихся запросов
+        timeout (int): Таймаут запроса в секундах
+        healthy_interval (int): Пауза между проверками доступной ссылки в секундах
+        failing_interval (int): Пауза после первой ошибки проверки в секундах
+        max_failing_interval (int): Максимальная пауза между проверками недоступной ссылки в секундах
+        backoff (float): Во сколько раз увеличивается пауза при каждой следующей ошибке подряд
+        jitter (float): Относительный случайный разброс пауз, например 0.1 это ±10%
+        duration (int): Длительность мониторинга в секундах
+        events_dir (str): Папка журнала событий, см. event_store
+        probe_method (str): Способ проверки: get, head или range, см. http_pool.fetch_status
+        limit_per_host (int): Максимальное количество keep-alive соединений к одному хосту
+        keepalive_timeout (int): Сколько секунд неиспользуемое соединение остается в пуле
+        metrics_port (int): Порт локального HTTP сервера метрик /metrics, 0 - не запускать сервер
+        metrics_host (str): Адрес HTTP сервера метрик
+        shard (int): Номер шарда при мониторинге в нескольких процессах, у каждого шарда свой журнал событий,
+                     None - мониторинг в одном процессе
+        checkpoint_path (str): Файл, в котором периодически сохраняются открытые сбои, чтобы после перезапуска
+                               мониторинг продолжил их без разрыва, None - не сохранять
+        dns_ttl (float): Сколько секунд кешировать адреса хоста, если DNS не сообщил TTL, см. dns_cache
+        dns_negative_ttl (float): Сколько секунд кешировать ошибку разрешения имени
+        dns_prefetch (bool): Разрешать ли имена всех хостов до начала проверок
+        confirmations (int): Сколько ошибок проверки подряд подтверждают сбой ссылки
+        breaker_threshold (int): Сколько ошибок подряд на хосте приостанавливают проверки его ссылок,
+                                 0 - не приостанавливать, см. circuit_breaker
+        breaker_cooldown (float): Пауза до пробной проверки хоста в секундах
+        breaker_max_cooldown (float): Максимальная пауза до пробной проверки хоста в секундах
+    """
+
+    def __init__(self, organizations: list, day: int, notify, concurrency: int = 500, timeout: int = 2,
+                 healthy_interval: int = 10, failing_interval: int = 5, duration: int = 86400,
+                 events_dir: str = 'events', probe_method: str = 'range', limit_per_host: int = 4,
+                 keepalive_timeout: int = 30, max_failing_interval: int = 20, backoff: float = 1.5,
+                 jitter: float = 0.1, metrics_port: int = 0, metrics_host: str = '127.0.0.1', shard: int = None,
+                 checkpoint_path: str = None, dns_ttl: float = 60, dns_negative_ttl: float = 5,
+                 dns_prefetch: bool = True, confirmations: int = 2, breaker_threshold: int = 5,
+                 breaker_cooldown: float = 20, breaker_max_cooldown: float = 120):
+        self.organizations = organizations
+        self.day = day
+        self.notify = notify
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.healthy_interval = healthy_interval
+        self.failing_interval = failing_interval
+        self.max_failing_interval = max_failing_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.duration = duration
+        self.probe_method = probe_method
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.metrics_port = metrics_port
+        self.metrics_host = metrics_host
+        self.events_dir = events_dir
+        self.shard = shard
+        self.checkpoint_path = checkpoint_path
+        self.dns_prefetch = dns_prefetch
+        self.confirmations = max(1, confirmations)
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.breaker_max_cooldown = breaker_max_cooldown
+        self.breakers = {}
+        self.skipped_probes = 0
+        self.resolver = CachingResolver(default_ttl=dns_ttl, negative_ttl=dns_negative_ttl, timeout=timeout)
+        self.catalog = TargetCatalog(events_dir)
+        self.targets = self.build_targets(organizations)
+        self.groups = self.group_targets()
+        self.events = None
+        self.stats = UptimeAggregator()
+        self.metrics = ProbeMetrics()
+        self.scheduler = None
+        self.probe_count = 0
+        self._session = None
+        self._semaphore = None
+        self._started_at = 0.0
+        self._cpu_started_at = 0.0
+        self._deadline = math.inf
+        self._stopped = False
+
+    def build_targets(self, organizations: list) -> dict:
+        """
+        Функция, создающая цели проверки для всех ссылок организаций. Новые организации добавляются
+        в справочник журнала событий.
+
+        Args:
+            organizations (list): Список словарей организаций
+
+        Returns:
+            dict: Цели проверки по ключу цели
+        """
+        return {target.key: target for target in (ProbeTarget(organisation, channel,
+                                                              self.catalog.target_id(organisation))
+                                                   for organisation in organizations
+                                                   for channel in CHANNELS
+                                                   if organisation.get(CHANNELS[channel]))}
+
+    def group_targets(self) -> dict:
+        """
+        Функция, группирующая цели проверки по ссылке. Планировщик хранит сроки проверок групп,
+        а каждая группа проверяется одним запросом.
+
+        Returns:
+            dict: Список целей по ссылке
+        """
+        groups = {}
+        for target in self.targets.values():
+            groups.setdefault(target.link, []).append(target)
+        return groups
+
+    def breaker(self, link: str) -> CircuitBreaker:
+        """
+        Функция, возвращающая автоматический выключатель хоста ссылки.
+
+        Args:
+            link (str): Ссылка
+
+        Returns:
+            CircuitBreaker: Выключатель хоста
+        """
+        host = urlsplit(link).hostname or link
+        breaker = self.breakers.get(host)
+        if breaker is None:
+            breaker = self.breakers[host] = CircuitBreaker(host, self.breaker_threshold, self.breaker_cooldown,
+                                                           self.breaker_max_cooldown, self.backoff)
+        return breaker
+
+    async def probe(self, link: str, timeout: float = None) -> ProbeResult:
+        """
+        Функция, выполняющая один запрос к ссылке с учетом глобального ограничения
+        на количество одновременных запросов. Время начала запроса и время ответа
+        считаются без ожидания семафора. Время фазы connect считается без времени DNS.
+
+        Args:
+            link (str): Проверяемая ссылка
+            timeout (float): Таймаут запроса в секундах, None - таймаут движка
+
+        Returns:
+            ProbeResult: Результат проверки
+        """
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            self.probe_count += 1
+            started, started_mono, timings = time.time(), loop.time(), {}
+            try:
+                status_code = await fetch_status(self._session, link, self.probe_method, timings, timeout)
+                error = None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status_code, error = 0, e
+            timings['total'] = loop.time() - started_mono
+            if 'connect' in timings:
+                timings['connect'] = max(0.0, timings['connect'] - timings.get('dns', 0.0))
+            return ProbeResult(status_code, started, started_mono, timings['total'], error, timings)
+
+    def next_interval(self, target: ProbeTarget) -> float:
+        """
+        Функция, возвращающая паузу до следующей проверки цели с учетом количества ошибок подряд.
+
+        Args:
+            target (ProbeTarget): Цель проверки
+
+        Returns:
+            float: Пауза в секундах
+        """
+        healthy_interval = target.healthy_interval or self.healthy_interval
+        failing_interval = target.failing_interval or self.failing_interval
+        return adaptive_interval(healthy_interval, failing_interval, target.error_count,
+                                 self.backoff, self.max_failing_interval)
+
+    def record(self, timestamp: float, target: ProbeTarget, kind: int, status: int = 0, latency: float = 0.0,
+               error: int = ERROR_NONE, value: float = 0.0) -> None:
+        """
+        Функция, записывающая событие мониторинга в журнал событий и сразу учитывающая его
+        в накопительной статистике доступности.
+
+        Args:
+            timestamp (float): Время события, секунды с начала эпохи
+            target (ProbeTarget): Цель проверки
+            kind (int): Тип события, см. event_store
+            status (int): HTTP код ответа, 0 если ответа нет
+            latency (float): Время ответа в секундах
+            error (int): Класс ошибки
+            value (float): Длительность сбоя в секундах для OUTAGE_END и OUTAGE_CUTOFF
+
+        Returns:
+            None
+        """
+        event = Event(timestamp, target.target_id, CHANNEL_IDS[target.channel], kind, error, status, latency, value)
+        self.events.append(event)
+        self.stats.observe(event)
+
+    async def check_link(self, link: str) -> None:
+        """
+        Функция, которая один раз проверяет ссылку, учитывает результат для всех целей с этой ссылкой
+        и планирует следующую проверку. Если автоматический выключатель хоста разомкнут, то запрос
+        не выполняется, а проверка переносится на время пробной проверки хоста. Последняя ошибка хоста
+        засчитывается только целям, проверки которых уже заканчивались ошибкой. Состояние цели без ошибок
+        не меняется до пробной проверки, так как другие ссылки хоста могут отвечать.
+        Непредвиденная ошибка записывается в лог, а следующая проверка все равно планируется, чтобы ссылка
+        не выпала из мониторинга до конца дня.
+
+        Args:
+            link (str): Проверяемая ссылка
+
+        Returns:
+            None
+        """
+        targets = self.groups.get(link)
+        if not targets:
+            return
+        loop = asyncio.get_running_loop()
+        breaker, trial, delay, cancelled = None, False, None, False
+        try:
+            breaker = self.breaker(link)
+            if not breaker.allow(loop.time()):
+                self.skipped_probes += 1
+                if breaker.last_failure is not None:
+                    # Ошибка хоста засчитывается в момент пропуска, а не в момент проверки другой ссылки хоста.
+                    failure = breaker.last_failure._replace(started=time.time(), started_mono=loop.time())
+                    for target in targets:
+                        if target.error_count:
+                            self.apply_result(target, failure, probed=False)
+                delay = breaker.retry_in(loop.time(), self.failing_interval)
+                return
+            trial = breaker.state == HALF_OPEN
+            result = await self.probe(link, max(target.timeout or self.timeout for target in targets))
+            breaker.record(result.error is None, loop.time(), trial, result)
+            trial = False
+            self.metrics.count(targets[0].channel, result.error is None)
+            for target in list(targets):
+                if self.targets.get(target.key) is target:
+                    self.apply_result(target, result)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        except Exception:
+            logging.exception(f"Непредвиденная ошибка при проверке {link}")
+        finally:
+            if trial:
+                breaker.release_trial()
+            targets = self.groups.get(link)
+            if targets and not cancelled:
+                if delay is None:
+                    delay = min(self.next_interval(target) for target in targets)
+                self.scheduler.schedule(link, delay)
+
+    def apply_result(self, target: ProbeTarget, result: ProbeResult, probed: bool = True) -> None:
+        """
+        Функция, учитывающая результат проверки ссылки для одной цели. Логика такая же, как в прежних потоковых
+        проверках: при сбое приходит одно сообщение в Telegram, при восстановлении приходит сообщение
+        о восстановлении. Чтобы одиночная ошибка не поднимала ложную тревогу, сбой объявляется только после
+        confirmations ошибок подряд, но начинается в момент отправки первой из них. Если ссылка восстановилась
+        раньше, то сбоя не было. Результат каждой проверки, начало сбоя и восстановление записываются в журнал
+        событий, из которого потом формируется отчет. Ошибка хоста, засчитанная без проверки, в журнал и метрики
+        проверок не записывается, а только подтверждает сбой. Сбой заканчивается в момент отправки первой успешной
+        проверки, а его длительность измеряется по монотонным часам, поэтому не зависит от перевода системных часов.
+
+        Args:
+            target (ProbeTarget): Цель проверки
+            result (ProbeResult): Результат проверки ссылки цели
+            probed (bool): False, если ссылка не проверялась, а засчитывается ошибка ее хоста
+
+        Returns:
+            None
+        """
+        organisation, link, name = target.organisation, target.link, target.name
+        if probed:
+            self.metrics.observe(target.key, {'organisation': name, 'channel': target.channel},
+                                 result.error is None, result.timings)
+        now = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(result.started))
+        if result.error is None:
+            logging.info(f"{link} - {result.status} - {now}")
+            self.record(result.started, target, SAMPLE, status=result.status, latency=result.latency)
+
+            if target.outage_started is not None:
+                duration = result.started_mono - target.outage_started_mono
+                self.record(target.outage_started + duration, target, OUTAGE_END, value=duration)
+                target.outage_started = target.outage_started_mono = None
+                message = f"{name} - {organisation['service_name']} - {link} - {now} - Восстановление"
+                self.notify(message)
+            target.error_count = 0
+        else:
+            error = str(result.error) or type(result.error).__name__
+            if isinstance(result.error, asyncio.TimeoutError):
+                error_class = ERROR_TIMEOUT
+            elif isinstance(getattr(result.error, 'os_error', None), DNSResolutionError):
+                error_class = ERROR_DNS
+            else:
+                error_class = ERROR_CONNECTION
+            if probed:
+                logging.info(f"{error} {now}")
+                self.record(result.started, target, SAMPLE, latency=result.latency, error=error_class)
+            target.error_count += 1
+            if target.error_count == 1:
+                target.failure_started, target.failure_started_mono = result.started, result.started_mono
+                target.outage_error = error_class
+            if target.error_count == self.confirmations and target.outage_started is None:
+                target.outage_started, target.outage_started_mono = target.failure_started, target.failure_started_mono
+                self.record(target.outage_started, target, OUTAGE_START, error=target.outage_error)
+                started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(target.outage_started))
+                message = f"{name} - {organisation['service_name']} - {link} - {started} - {error}"
+                self.notify(message)
+
+    def close_outage(self, target: ProbeTarget) -> None:
+        """
+        Функция, закрывающая открытый сбой цели как не закончившийся, например когда цель удалена из списка.
+
+        Args:
+            target (ProbeTarget): Цель проверки
+
+        Returns:
+            None
+        """
+        if target.outage_started is None:
+            return
+        duration = asyncio.get_running_loop().time() - target.outage_started_mono
+        self.record(target.outage_started + duration, target, OUTAGE_CUTOFF, value=duration)
+        target.outage_started = target.outage_started_mono = None
+
+    def update_targets(self, organizations: list) -> None:
+        """
+        Функция, применяющая новый список организаций к работающему мониторингу. Новые ссылки планируются
+        так же, как при запуске, удаленные снимаются с планировщика, а их открытые сбои закрываются. Новая цель
+        со ссылкой, которая уже проверяется, получает результат следующей проверки этой ссылки. Если у ссылки
+        изменился адрес, то она проверяется как новая. Если изменились только наименование сервиса, интервалы
+        или таймаут, то новые значения применяются со следующей проверки, а состояние ссылки сохраняется.
+        Проверки остальных ссылок не затрагиваются. Настройки всех организаций проверяются до изменения
+        состояния, поэтому список с ошибкой не применяется частично.
+
+        Args:
+            organizations (list): Новый список словарей организаций
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: Если у организации неверные интервалы проверки или таймаут, см. check_target_options
+        """
+        for organisation in organizations:
+            check_target_options(organisation)
+        self.catalog.reload()
+        targets = self.build_targets(organizations)
+        added, removed, changed = [], [], []
+        for key, target in list(self.targets.items()):
+            new_target = targets.get(key)
+            if new_target is not None and new_target.link == target.link:
+                if new_target.organisation != target.organisation:
+                    target.organisation = new_target.organisation
+                    target.healthy_interval = new_target.healthy_interval
+                    target.failing_interval = new_target.failing_interval
+                    target.timeout = new_target.timeout
+                    changed.append(key)
+                continue
+            if self.events is not None:
+                self.close_outage(target)
+            del self.targets[key]
+            removed.append(key)
+        for key, target in targets.items():
+            if key in self.targets:
+                continue
+            self.targets[key] = target
+            added.append(key)
+        previous, self.groups = self.groups, self.group_targets()
+        if self.scheduler is not None:
+            for link in previous.keys() - self.groups.keys():
+                self.scheduler.cancel(link)
+            for link in self.groups.keys() - previous.keys():
+                self.schedule_first(link)
+        self.organizations = organizations
+        if added or removed or changed:
+            logging.info(f"Список целей обновлен: добавлено {len(added)}, удалено {len(removed)}, "
+                         f"изменено {len(changed)}")
+
+    def schedule_first(self, link: str) -> None:
+        """
+        Функция, планирующая первую проверку ссылки. Первые проверки равномерно распределены по интервалу
+        проверки, см. scheduler.initial_delay.
+
+        Args:
+            link (str): Ссылка
+
+        Returns:
+            None
+        """
+        interval = min(self.next_interval(target) for target in self.groups[link])
+        self.scheduler.schedule(link, initial_delay(link, interval), jitter=False)
+
+    def throughput(self) -> [float, float]:
+        """
+        Функция, считающая пропускную способность движка: сколько проверок в секунду выполняется
+        сейчас и сколько проверок в секунду может выдержать одно ядро процессора, то есть количество
+        проверок на секунду процессорного времени процесса.
+
+        Returns:
+            [float, float]: проверок в секунду и проверок на секунду процессорного времени
+        """
+        elapsed = asyncio.get_running_loop().time() - self._started_at
+        cpu_time = time.process_time() - self._cpu_started_at
+        probes_per_second = self.probe_count / elapsed if elapsed > 0 else 0.0
+        probes_per_cpu_second = self.probe_count / cpu_time if cpu_time > 0 else 0.0
+        return probes_per_second, probes_per_cpu_second
+
+    async def report_throughput(self, interval: int = 60) -> None:
+        """
+        Функция, которая периодически выводит в лог пропускную способность движка.
+
+        Args:
+            interval (int): Период вывода в секундах
+
+        Returns:
+            None
+        """
+        while True:
+            await asyncio.sleep(interval)
+            probes_per_second, probes_per_cpu_second = self.throughput()
+            logging.info(f"Проверок: {self.probe_count} - {probes_per_second:.1f} в секунду - "
+                         f"{probes_per_cpu_second:.1f} на секунду CPU одного ядра")
+
+    def render_metrics(self) -> str:
+        """
+        Функция, выгружающая метрики движка в текстовом формате Prometheus: перцентили времени фаз
+        проверок каждой ссылки, счетчики проверок, пропускную способность и количество открытых сбоев.
+
+        Returns:
+            str: Метрики в текстовом формате Prometheus
+        """
+        probes_per_second, probes_per_cpu_second = self.throughput()
+        return self.metrics.render({
+            'probe_engine_probes_per_second': round(probes_per_second, 3),
+            'probe_engine_probes_per_cpu_second': round(probes_per_cpu_second, 3),
+            'probe_engine_scheduler_lag_seconds': round(self.scheduler.mean_lag(), 6),
+            'probe_engine_open_outages': sum(target.outage_started is not None for target in self.targets.values()),
+            'probe_engine_open_breakers': sum(breaker.state == OPEN for breaker in self.breakers.values()),
+        }, counters={
+            'probe_engine_probes': self.probe_count,
+            'probe_engine_dns_cache_hits': self.resolver.hits,
+            'probe_engine_dns_cache_misses': self.resolver.misses,
+            'probe_engine_dns_failures': self.resolver.failures,
+            'probe_engine_skipped_probes': self.skipped_probes,
+        })
+
+    async def flush_events(self, interval: float = 1.0) -> None:
+        """
+        Функция, которая периодически записывает буфер журнала событий в файл и сохраняет открытые сбои
+        в checkpoint_path.
+
+        Args:
+            interval (float): Период записи в секундах
+
+        Returns:
+            None
+        """
+        while True:
+            await asyncio.sleep(interval)
+            self.events.flush()
+            if self.checkpoint_path:
+                self.save_checkpoint()
+
+    def save_checkpoint(self) -> None:
+        """
+        Функция, атомарно сохраняющая в checkpoint_path день мониторинга и открытые сбои: начало сбоя,
+        класс ошибки и количество ошибок подряд для каждой ссылки.
+
+        Returns:
+            None
+        """
+        outages = {target.key: {'target_id': target.target_id, 'channel': target.channel,
+                                'started': target.outage_started, 'error': target.outage_error,
+                                'error_count': target.error_count}
+                   for target in self.targets.values() if target.outage_started is not None}
+        tmp_path = f'{self.checkpoint_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({'day': self.day, 'saved_at': time.time(), 'outages': outages}, file, ensure_ascii=False)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def restore_checkpoint(self) -> None:
+        """
+        Функция, продолжающая открытые сбои из checkpoint_path после перезапуска. Если сохраненный день
+        совпадает с текущим, то сбой продолжается с прежнего начала, а новое начало сбоя в журнал не пишется.
+        Если день сменился, пока мониторинг был остановлен, то в журнале прежнего дня сбой закрывается
+        как не закончившийся, а в журнале текущего дня открывается заново с начала текущей статистики.
+        Пока мониторинг был остановлен, ссылка считается недоступной до первой успешной проверки.
+
+        Returns:
+            None
+        """
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return
+        with open(self.checkpoint_path, encoding='utf-8') as file:
+            state = json.load(file)
+        if not state['outages']:
+            return
+        loop, now = asyncio.get_running_loop(), time.time()
+        previous_day = None
+        if state['day'] != self.day:
+            previous_day = EventWriter(day_path(self.events_dir, state['day'], self.shard))
+        for key, saved in state['outages'].items():
+            started = saved['started']
+            if previous_day is not None:
+                started = max(started, self.stats.started_at)
+                previous_day.append(Event(started, saved['target_id'], CHANNEL_IDS[saved['channel']], OUTAGE_CUTOFF,
+                                          ERROR_NONE, 0, 0.0, started - saved['started']))
+            target = self.targets.get(key)
+            if target is None:
+                continue
+            target.outage_started, target.outage_started_mono = started, loop.time() - (now - started)
+            target.outage_error, target.error_count = saved['error'], saved['error_count']
+            if previous_day is not None:
+                self.record(started, target, OUTAGE_START, error=target.outage_error)
+        if previous_day is not None:
+            previous_day.close()
+        logging.info(f"Продолжены открытые сбои из {self.checkpoint_path}: {len(state['outages'])}")
+
+    def close_dangling_outages(self) -> None:
+        """
+        Функция, закрывающая сбои, которые остались открытыми в журнале дня после аварийной остановки
+        прежнего процесса, например упавшего шарда. Без checkpoint_path такие сбои не продолжаются, поэтому
+        они закрываются как не закончившиеся временем последней записи журнала, то есть примерно моментом
+        остановки. Иначе сбой считался бы до конца дня, даже если ссылка восстановилась. Если ссылка все еще
+        недоступна, то новый сбой будет объявлен по результатам проверок.
+
+        Returns:
+            None
+        """
+        open_outages, last_timestamp = {}, 0.0
+        for event in read_events(self.events.path):
+            last_timestamp = max(last_timestamp, event.timestamp)
+            if event.kind == OUTAGE_START:
+                open_outages[(event.target_id, event.channel)] = event.timestamp
+            elif event.kind in (OUTAGE_END, OUTAGE_CUTOFF):
+                open_outages.pop((event.target_id, event.channel), None)
+        for (target_id, channel), started in open_outages.items():
+            self.events.append(Event(last_timestamp, target_id, channel, OUTAGE_CUTOFF, ERROR_NONE, 0, 0.0,
+                                     last_timestamp - started))
+        if open_outages:
+            self.events.flush()
+            logging.warning(f"Закрыты сбои, оставшиеся открытыми после аварийной остановки: {len(open_outages)}")
+
+    def rollover(self, day: int, boundary: float) -> UptimeAggregator:
+        """
+        Функция, переключающая мониторинг на новый день без остановки проверок. Открытые сбои закрываются
+        в журнале прошлого дня ровно на границе дней и открываются в журнале нового дня с той же границы.
+
+        Args:
+            day (int): Новый день
+            boundary (float): Граница дней, секунды с начала эпохи
+
+        Returns:
+            UptimeAggregator: Накопительная статистика прошлого дня, по которой строится его отчет
+        """
+        boundary_mono = asyncio.get_running_loop().time() - (time.time() - boundary)
+        open_targets = [target for target in self.targets.values() if target.outage_started is not None]
+        for target in open_targets:
+            duration = boundary_mono - target.outage_started_mono
+            self.record(target.outage_started + duration, target, OUTAGE_CUTOFF, value=duration)
+        self.events.close()
+        previous = self.stats
+        self.day = day
+        self.events = EventWriter(day_path(self.events_dir, day, self.shard))
+        self.stats = UptimeAggregator()
+        self.stats.started_at = boundary
+        for target in open_targets:
+            target.outage_started, target.outage_started_mono = boundary, boundary_mono
+            self.record(boundary, target, OUTAGE_START, error=target.outage_error)
+        if self.checkpoint_path:
+            self.save_checkpoint()
+        logging.info(f"Мониторинг переключен на день {day}, перенесено открытых сбоев: {len(open_targets)}")
+        return previous
+
+    def stop(self) -> None:
+        """
+        Функция, останавливающая мониторинг, например по сигналу SIGTERM. В отличие от окончания длительности
+        мониторинга, открытые сбои не закрываются, а остаются в checkpoint_path и продолжаются после перезапуска.
+
+        Returns:
+            None
+        """
+        self._stopped = True
+        self._deadline = 0.0
+        if self.scheduler is not None:
+            self.scheduler.interrupt()
+
+    async def run(self) -> None:
+        """
+        Функция, которая запускает проверки всех ссылок всех организаций и ждет, когда пройдет
+        заданная длительность мониторинга. Планировщик выдает цели, срок проверки которых наступил,
+        и для каждой из них запускается отдельная задача проверки. Сбои, не закончившиеся к концу
+        мониторинга, закрываются ровно на границе его длительности, если только мониторинг не остановлен
+        через stop.
+
+        Returns:
+            None
+        """
+        loop = asyncio.get_running_loop()
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self.scheduler = ProbeScheduler(jitter=self.jitter)
+        self._started_at = loop.time()
+        self._cpu_started_at = time.process_time()
+        self.events = EventWriter(day_path(self.events_dir, self.day, self.shard))
+        if self.stats.started_at is None:
+            self.stats.started_at = time.time()
+        if not self._stopped:
+            self._deadline = self._started_at + self.duration
+        if self.checkpoint_path:
+            self.restore_checkpoint()
+        else:
+            self.close_dangling_outages()
+        for link in self.groups:
+            self.schedule_first(link)
+        in_flight = set()
+        if self.dns_prefetch:
+            hosts = {urlsplit(target.link).hostname for target in self.targets.values()}
+            resolved = await self.resolver.prefetch([host for host in hosts if host])
+            logging.info(f"Заранее разрешены имена хостов: {resolved} из {len(hosts)}")
+        async with create_probe_session(self.timeout, self.concurrency, self.limit_per_host,
+                                        self.keepalive_timeout, self.resolver) as session:
+            self._session = session
+            metrics_server = None
+            if self.metrics_port:
+                metrics_server = await start_metrics_server(self.render_metrics, self.metrics_host, self.metrics_port)
+            reporter = asyncio.create_task(self.report_throughput())
+            flusher = asyncio.create_task(self.flush_events())
+            while loop.time() < self._deadline:
+                for link in await self.scheduler.wait_due(self._deadline):
+                    task = asyncio.create_task(self.check_link(link))
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+            if in_flight:
+                await asyncio.gather(*in_flight)
+            reporter.cancel()
+            flusher.cancel()
+            if metrics_server is not None:
+                await metrics_server.cleanup()
+        await self.resolver.close()
+        for target in self.targets.values():
+            if target.outage_started is not None and not self._stopped:
+                duration = min(loop.time(), self._started_at + self.duration) - target.outage_started_mono
+                self.record(target.outage_started + duration, target, OUTAGE_CUTOFF, value=duration)
+                target.outage_started = target.outage_started_mono = None
+        if self.checkpoint_path:
+            self.save_checkpoint()
+        self.events.close()
+        probes_per_second, probes_per_cpu_second = self.throughput()
+        logging.info(f"Мониторинг завершен. Проверок: {self.probe_count} - {probes_per_second:.1f} в секунду - "
+                     f"{probes_per_cpu_second:.1f} на секунду CPU одного ядра - "
+                     f"пробуждений планировщика: {self.scheduler.wakeups} - "
+                     f"пропущено на недоступных хостах: {self.skipped_probes}")
@@ -0,0 +1,176 @@
+import asyncio
+import heapq
+import itertools
+import math
+import random
+import zlib
+
+
+def initial_delay(key: str, interval: float) -> float:
+    """
+    Функция, возвращающая задержку первой проверки цели. Задержка вычисляется из хэша ключа цели,
+    поэтому цели равномерно распределяются по интервалу проверки, а не стартуют все одновременно,
+    и цели с одинаковым хостом (например, Сбербанк и Альфа-Банк на sberbank.com) не проверяются залпом.
+
+    Args:
+        key (str): Ключ цели
+        interval (float): Интервал проверки в секундах
+
+    Returns:
+        float: Задержка первой проверки в секундах
+    """
+    return zlib.crc32(key.encode('utf-8')) / 2 ** 32 * interval
+
+
+def adaptive_interval(healthy_interval: float, failing_interval: float, error_count: int,
+                      backoff: float, max_failing_interval: float) -> float:
+    """
+    Функция, возвращающая интервал до следующей проверки. Пока ссылка доступна, используется
+    healthy_interval. После первой ошибки ссылка проверяется через failing_interval, а при каждой
+    следующей ошибке подряд интервал увеличивается в backoff раз, но не больше max_failing_interval.
+
+    Args:
+        healthy_interval (float): Интервал проверки доступной ссылки в секундах
+        failing_interval (float): Интервал проверки после первой ошибки в секундах
+        error_count (int): Количество ошибок подряд
+        backoff (float): Множитель увеличения интервала при каждой следующей ошибке
+        max_failing_interval (float): Максимальный интервал проверки недоступной ссылки в секундах
+
+    Returns:
+        float: Интервал до следующей проверки в секундах
+    """
+    if error_count == 0:
+        return healthy_interval
+    return min(failing_interval * backoff ** (error_count - 1), max(failing_interval, max_failing_interval))
+
+
+class ProbeScheduler:
+    """
+    Центральный планировщик проверок на основе кучи. Вместо отдельного sleep в каждой проверке
+    все сроки проверок хранятся в одной куче, а планировщик просыпается не чаще одного раза за tick
+    секунд и выдает все цели, срок проверки которых наступил. Поэтому количество пробуждений в секунду
+    ограничено 1 / tick независимо от количества целей. К каждому интервалу добавляется случайный
+    разброс jitter, чтобы проверки не синхронизировались со временем. У каждой цели в куче действителен
+    только последний срок: повторное планирование переносит проверку, а cancel снимает ее. Устаревшие
+    записи не ищутся в куче, а пропускаются, когда доходят до ее вершины.
+
+    Args:
+        tick (float): Минимальный период между пробуждениями планировщика в секундах
+        jitter (float): Относительный разброс интервала, например 0.1 это ±10%
+    """
+
+    def __init__(self, tick: float = 0.05, jitter: float = 0.1):
+        self.tick = tick
+        self.jitter = jitter
+        self.wakeups = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self.dispatched = 0
+        self._heap = []
+        self._counter = itertools.count()
+        self._tokens = {}
+        self._wake_at = math.inf
+        self._rescheduled = asyncio.Event()
+        self._interrupted = False
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    def schedule(self, key: str, delay: float, jitter: bool = True) -> None:
+        """
+        Функция, планирующая проверку цели через delay секунд. Если проверка цели уже запланирована,
+        то она переносится.
+
+        Args:
+            key (str): Ключ цели
+            delay (float): Задержка в секундах
+            jitter (bool): Добавлять ли к задержке случайный разброс
+
+        Returns:
+            None
+        """
+        if jitter and self.jitter:
+            delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        due = asyncio.get_running_loop().time() + delay
+        token = self._tokens[key] = next(self._counter)
+        heapq.heappush(self._heap, (due, token, key))
+        if due < self._wake_at:
+            self._rescheduled.set()
+
+    def cancel(self, key: str) -> None:
+        """
+        Функция, снимающая запланированную проверку цели, например когда цель удалена из списка.
+
+        Args:
+            key (str): Ключ цели
+
+        Returns:
+            None
+        """
+        self._tokens.pop(key, None)
+
+    def _drop_stale(self) -> None:
+        while self._heap and self._tokens.get(self._heap[0][2]) != self._heap[0][1]:
+            heapq.heappop(self._heap)
+
+    async def wait_due(self, deadline: float) -> list:
+        """
+        Функция, которая ждет ближайшего срока проверки и возвращает все цели, срок проверки которых
+        наступил. Время пробуждения округляется вверх до сетки tick, чтобы пробуждений было не больше
+        1 / tick в секунду. Если во время ожидания запланирована более ранняя проверка, то время
+        пробуждения пересчитывается. Если до deadline ничего не наступило или ожидание прервано через interrupt,
+        то возвращается пустой список.
+
+        Args:
+            deadline (float): Время event loop, после которого ждать не нужно
+
+        Returns:
+            list: Ключи целей, которые нужно проверить
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            self._drop_stale()
+            wake_at = min(self._heap[0][0], deadline) if self._heap else deadline
+            self._wake_at = math.ceil(wake_at / self.tick) * self.tick if math.isfinite(wake_at) else wake_at
+            self._rescheduled.clear()
+            try:
+                await asyncio.wait_for(self._rescheduled.wait(), max(0.0, self._wake_at - loop.time()))
+            except asyncio.TimeoutError:
+                break
+            if self._interrupted:
+                self._interrupted = False
+                self._wake_at = math.inf
+                return []
+        self._wake_at = math.inf
+        self.wakeups += 1
+        now = loop.time()
+        keys = []
+        self._drop_stale()
+        while self._heap and self._heap[0][0] <= now:
+            due, _, key = heapq.heappop(self._heap)
+            del self._tokens[key]
+            self._drop_stale()
+            self.total_lag += now - due
+            self.max_lag = max(self.max_lag, now - due)
+            keys.append(key)
+        self.dispatched += len(keys)
+        return keys
+
+    def interrupt(self) -> None:
+        """
+        Функция, прерывающая текущее ожидание wait_due, например при остановке мониторинга.
+
+        Returns:
+            None
+        """
+        self._interrupted = True
+        self._rescheduled.set()
+
+    def mean_lag(self) -> float:
+        """
+        Функция, возвращающая среднее опоздание проверок относительно запланированного срока.
+
+        Returns:
+            float: Среднее опоздание в секундах
+        """
+        return self.total_lag / self.dispatched if self.dispatched else 0.0
@@ -0,0 +1,69 @@
+import zlib
+from bisect import bisect_right
+from urllib.parse import urlsplit
+
+from probe_engine import CHANNELS
+
+
+class HashRing:
+    """
+    Кольцо консистентного хеширования. Каждый шард представлен на кольце replicas точками, а ключ
+    достается шарду, чья точка первая по часовой стрелке от хеша ключа. При изменении количества шардов
+    переезжает только небольшая доля ключей, поэтому остальные шарды сохраняют свои ссылки и пулы соединений.
+
+    Args:
+        shards (int): Количество шардов
+        replicas (int): Количество точек одного шарда на кольце
+    """
+
+    def __init__(self, shards: int, replicas: int = 100):
+        points = sorted((zlib.crc32(f'{shard}:{replica}'.encode()), shard)
+                        for shard in range(shards) for replica in range(replicas))
+        self._hashes = [point for point, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    def shard_for(self, key: str) -> int:
+        """
+        Функция, возвращающая шард ключа.
+
+        Args:
+            key (str): Ключ, например хост ссылки
+
+        Returns:
+            int: Номер шарда
+        """
+        index = bisect_right(self._hashes, zlib.crc32(key.encode())) % len(self._hashes)
+        return self._shards[index]
+
+
+def partition_organizations(organizations: list, shards: int) -> list:
+    """
+    Функция, распределяющая ссылки организаций по шардам консистентным хешированием по хосту ссылки.
+    Все ссылки одного хоста попадают в один шард, поэтому ограничение количества соединений на хост
+    и переиспользование keep-alive соединений работают так же, как в одном процессе. Ссылки одной организации
+    могут попасть в разные шарды: тогда в каждом шарде у организации остается только ее ссылка.
+
+    Args:
+        organizations (list): Список словарей организаций
+        shards (int): Количество шардов
+
+    Returns:
+        list: Список организаций для каждого шарда
+    """
+    ring = HashRing(shards)
+    result = [[] for _ in range(shards)]
+    for organisation in organizations:
+        parts = {}
+        for link_key in CHANNELS.values():
+            link = organisation.get(link_key)
+            if not link:
+                continue
+            shard = ring.shard_for(urlsplit(link).hostname or link)
+            part = parts.get(shard)
+            if part is None:
+                part = parts[shard] = {key: value for key, value in organisation.items()
+                                       if key not in CHANNELS.values()}
+            part[link_key] = link
+        for shard, part in parts.items():
+            result[shard].append(part)
+    return result
@@ -0,0 +1,120 @@
+import asyncio
+import json
+import logging
+import os
+from urllib.parse import urlsplit
+
+import yaml
+
+from probe_engine import CHANNELS, TARGET_OPTIONS, check_target_options
+
+
+def load_targets(path: str) -> list:
+    """
+    Функция, читающая список организаций из файла целей в формате YAML или JSON (по расширению .json).
+    В файле есть список organizations, а на верхнем уровне можно задать настройки TARGET_OPTIONS для всех
+    организаций. Настройки организации имеют приоритет над настройками файла и должны быть положительными числами.
+
+    Args:
+        path (str): Путь до файла целей, например targets.yml
+
+    Returns:
+        list: Список словарей организаций
+
+    Raises:
+        ValueError: Если в файле нет списка организаций, у организации нет наименования, сервиса или ссылок,
+                    ссылка не является http(s) адресом с хостом, интервал проверки или таймаут не является
+                    положительным числом или наименования организаций повторяются
+    """
+    with open(path, encoding='utf-8') as file:
+        data = json.load(file) if path.endswith('.json') else yaml.safe_load(file)
+    if not isinstance(data, dict) or not isinstance(data.get('organizations'), list):
+        raise ValueError(f'{path}: нет списка organizations')
+    defaults = {option: data[option] for option in TARGET_OPTIONS if option in data}
+    organizations, names = [], set()
+    for number, organisation in enumerate(data['organizations'], 1):
+        if not isinstance(organisation, dict) or not organisation.get('organisation_name') \
+                or not organisation.get('service_name'):
+            raise ValueError(f'{path}: у организации {number} нет organisation_name или service_name')
+        if not any(organisation.get(link_key) for link_key in CHANNELS.values()):
+            raise ValueError(f"{path}: у организации {organisation['organisation_name']} нет ссылок")
+        for link_key in CHANNELS.values():
+            if organisation.get(link_key) and not is_valid_link(organisation[link_key]):
+                raise ValueError(f"{path}: у организации {organisation['organisation_name']} "
+                                 f"неверная ссылка {link_key}: {organisation[link_key]!r}")
+        if organisation['organisation_name'] in names:
+            raise ValueError(f"{path}: организация {organisation['organisation_name']} указана дважды")
+        names.add(organisation['organisation_name'])
+        organisation = {**defaults, **organisation}
+        try:
+            check_target_options(organisation)
+        except ValueError as e:
+            raise ValueError(f'{path}: {e}') from None
+        organizations.append(organisation)
+    return organizations
+
+
+def is_valid_link(link) -> bool:
+    """
+    Функция, проверяющая, что ссылку можно проверять: это строка с адресом http или https и именем хоста.
+
+    Args:
+        link: Ссылка из файла целей
+
+    Returns:
+        bool: True, если ссылка правильная
+    """
+    if not isinstance(link, str):
+        return False
+    try:
+        parts = urlsplit(link)
+        return parts.scheme in ('http', 'https') and bool(parts.hostname)
+    except ValueError:
+        return False
+
+
+def file_signature(path: str):
+    """
+    Функция, возвращающая время изменения и размер файла, по которым замечается его изменение.
+
+    Args:
+        path (str): Путь до файла
+
+    Returns:
+        Кортеж (время изменения, размер) или None, если файла нет
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+async def watch_targets(path: str, apply, interval: float = 5.0) -> None:
+    """
+    Функция, которая следит за файлом целей и при его изменении передает новый список организаций в apply.
+    Файл опрашивается раз в interval секунд. Если файл с ошибкой, то изменение пропускается, а мониторинг
+    продолжает проверять прежний список.
+
+    Args:
+        path (str): Путь до файла целей
+        apply: Функция, принимающая новый список организаций, например ProbeEngine.update_targets
+        interval (float): Период опроса файла в секундах
+
+    Returns:
+        None
+    """
+    signature = file_signature(path)
+    while True:
+        await asyncio.sleep(interval)
+        current = file_signature(path)
+        if current == signature or current is None:
+            continue
+        signature = current
+        try:
+            apply(load_targets(path))
+        except (OSError, ValueError, yaml.YAMLError) as e:
+            logging.error(f"Файл целей {path} не применен: {e}")
+        except Exception:
+            # Опрос файла не должен останавливаться, иначе следующие правки файла не будут применены.
+            logging.exception(f"Файл целей {path} не применен")
@@ -0,0 +1,233 @@
+import time
+from bisect import bisect_left, bisect_right
+
+from event_store import CHANNEL_NAMES, OUTAGE_CUTOFF, OUTAGE_END, OUTAGE_START, SAMPLE, Event
+from metrics import LatencyHistogram
+
+
+class OutageSeries:
+    """
+    Накопленная статистика одной ссылки организации: количество проверок и ошибок, гистограмма времени
+    успешных ответов, закрытые сбои в виде отсортированных интервалов с префиксными суммами времени
+    недоступности и открытый сбой.
+    Префиксные суммы считаются с начала мониторинга: forgotten хранит время недоступности удаленных
+    сбоев, то есть сумму перед первым оставшимся интервалом.
+    Префиксные суммы позволяют посчитать время недоступности за любое окно двумя бинарными поисками
+    по интервалам, без просмотра журнала.
+    """
+
+    def __init__(self, first_seen: float):
+        self.first_seen = first_seen
+        self.probes = 0
+        self.failures = 0
+        self.latency = LatencyHistogram()
+        self.starts = []
+        self.ends = []
+        self.recovered = []
+        self.cumulative = []
+        self.forgotten = 0.0
+        self.open_start = None
+
+    def close(self, duration: float, recovered: bool) -> None:
+        """
+        Функция, закрывающая открытый сбой. Окончание сбоя считается от его начала по длительности,
+        измеренной по монотонным часам.
+
+        Args:
+            duration (float): Длительность сбоя в секундах
+            recovered (bool): True, если ссылка восстановилась, и False, если мониторинг закончился раньше
+
+        Returns:
+            None
+        """
+        if self.open_start is None:
+            return
+        start, self.open_start = self.open_start, None
+        end = start + max(duration, 0.0)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.recovered.append(recovered)
+        self.cumulative.append((self.cumulative[-1] if self.cumulative else self.forgotten) + end - start)
+
+    def downtime(self, start: float, end: float, now: float) -> float:
+        """
+        Функция, считающая время недоступности в окне [start, end]. Открытый сбой считается до now.
+
+        Args:
+            start (float): Начало окна, секунды с начала эпохи
+            end (float): Конец окна, секунды с начала эпохи
+            now (float): Текущее время, секунды с начала эпохи
+
+        Returns:
+            float: Время недоступности в секундах
+        """
+        total = 0.0
+        first = bisect_right(self.ends, start)
+        last = bisect_left(self.starts, end) - 1
+        if first <= last:
+            total = self.cumulative[last] - (self.cumulative[first - 1] if first else self.forgotten)
+            total -= max(0.0, start - self.starts[first])
+            total -= max(0.0, self.ends[last] - end)
+        if self.open_start is not None:
+            total += max(0.0, min(end, now) - max(start, self.open_start))
+        return total
+
+    def outages(self, start: float, end: float) -> list:
+        """
+        Функция, возвращающая сбои, пересекающиеся с окном [start, end].
+
+        Args:
+            start (float): Начало окна, секунды с начала эпохи
+            end (float): Конец окна, секунды с начала эпохи
+
+        Returns:
+            list: Список [начало сбоя, окончание сбоя или None, если ссылка еще не восстановилась]
+        """
+        first = bisect_right(self.ends, start)
+        last = bisect_left(self.starts, end)
+        result = [[self.starts[i], self.ends[i] if self.recovered[i] else None] for i in range(first, last)]
+        if self.open_start is not None and self.open_start < end:
+            result.append([self.open_start, None])
+        return result
+
+    def forget_before(self, timestamp: float) -> None:
+        """
+        Функция, удаляющая закрытые сбои, закончившиеся раньше timestamp.
+
+        Args:
+            timestamp (float): Граница хранения, секунды с начала эпохи
+
+        Returns:
+            None
+        """
+        count = bisect_right(self.ends, timestamp)
+        if count:
+            self.forgotten = self.cumulative[count - 1]
+            del self.starts[:count], self.ends[:count], self.recovered[:count], self.cumulative[:count]
+            self.first_seen = max(self.first_seen, timestamp)
+
+
+class UptimeAggregator:
+    """
+    Накопительная статистика доступности всех ссылок, которая обновляется при каждом событии мониторинга.
+    Отчет за любое окно (последний час, сегодня, скользящие 24 часа) строится в любой момент по накопленным
+    интервалам сбоев, без повторного чтения журнала событий. Время построения не зависит от количества проверок
+    и размера журнала. Сбои старше retention секунд забываются.
+
+    Args:
+        retention (float): Сколько секунд хранить закрытые сбои
+    """
+
+    def __init__(self, retention: float = 2 * 86400):
+        self.retention = retention
+        self.started_at = None
+        self.series = {}
+        self._next_cleanup = 0.0
+
+    def observe(self, event: Event) -> None:
+        """
+        Функция, обновляющая статистику по одному событию мониторинга.
+
+        Args:
+            event (Event): Событие из журнала событий
+
+        Returns:
+            None
+        """
+        if self.started_at is None:
+            self.started_at = event.timestamp
+        key = (event.target_id, CHANNEL_NAMES[event.channel])
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = OutageSeries(event.timestamp)
+        if event.kind == SAMPLE:
+            series.probes += 1
+            if event.status == 0:
+                series.failures += 1
+            else:
+                series.latency.record(event.latency)
+        elif event.kind == OUTAGE_START:
+            if series.open_start is None:
+                series.open_start = event.timestamp
+        elif event.kind in (OUTAGE_END, OUTAGE_CUTOFF) and series.open_start is not None:
+            # Окончание сбоя берется из времени события, а не из его длительности: если процесс мониторинга
+            # перезапускался во время сбоя, то длительность измерена от начала сбоя в новом процессе.
+            series.close(event.timestamp - series.open_start, event.kind == OUTAGE_END)
+        if event.timestamp >= self._next_cleanup:
+            self._next_cleanup = event.timestamp + 3600
+            for item in self.series.values():
+                item.forget_before(event.timestamp - self.retention)
+
+    def downtime(self, target_id: int, channel: str, start: float, end: float, now: float = None) -> float:
+        """
+        Функция, возвращающая время недоступности ссылки в окне [start, end].
+
+        Args:
+            target_id (int): Id организации в журнале событий
+            channel (str): Канал проверки, website или mobile
+            start (float): Начало окна, секунды с начала эпохи
+            end (float): Конец окна, секунды с начала эпохи
+            now (float): Текущее время, до которого считается открытый сбой, по умолчанию time.time()
+
+        Returns:
+            float: Время недоступности в секундах
+        """
+        series = self.series.get((target_id, channel))
+        if series is None:
+            return 0.0
+        return series.downtime(start, end, time.time() if now is None else now)
+
+    def uptime(self, target_id: int, channel: str, start: float, end: float, now: float = None) -> float:
+        """
+        Функция, возвращающая uptime ссылки в окне [start, end] в процентах. Если ссылка начала проверяться
+        позже начала окна, то окно начинается с первой проверки.
+
+        Args:
+            target_id (int): Id организации в журнале событий
+            channel (str): Канал проверки, website или mobile
+            start (float): Начало окна, секунды с начала эпохи
+            end (float): Конец окна, секунды с начала эпохи
+            now (float): Текущее время, по умолчанию time.time()
+
+        Returns:
+            float: Uptime в процентах
+        """
+        now = time.time() if now is None else now
+        series = self.series.get((target_id, channel))
+        if series is None:
+            return 100.0
+        start = max(start, series.first_seen)
+        period = min(end, now) - start
+        if period <= 0:
+            return 100.0
+        return (period - series.downtime(start, end, now)) / period * 100
+
+    def outages(self, target_id: int, channel: str, start: float, end: float) -> list:
+        """
+        Функция, возвращающая сбои ссылки, пересекающиеся с окном [start, end].
+
+        Args:
+            target_id (int): Id организации в журнале событий
+            channel (str): Канал проверки, website или mobile
+            start (float): Начало окна, секунды с начала эпохи
+            end (float): Конец окна, секунды с начала эпохи
+
+        Returns:
+            list: Список [начало сбоя, окончание сбоя или None, если ссылка еще не восстановилась]
+        """
+        series = self.series.get((target_id, channel))
+        return series.outages(start, end) if series is not None else []
+
+    def latency(self, target_id: int, channel: str) -> LatencyHistogram:
+        """
+        Функция, возвращающая гистограмму времени успешных ответов ссылки.
+
+        Args:
+            target_id (int): Id организации в журнале событий
+            channel (str): Канал проверки, website или mobile
+
+        Returns:
+            LatencyHistogram: Гистограмма времени ответа
+        """
+        series = self.series.get((target_id, channel))
+        return series.latency if series is not None else LatencyHistogram()